@@ -1,33 +1,133 @@
 from huggingface_hub import hf_hub_download
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 import asyncio
 import onnxruntime as ort
 from transformers import AutoTokenizer
 import numpy as np
 import time
+import os
+import json
 from fastapi import FastAPI, HTTPException
 from models.sentiment import TextsRequest, PredictionResponse
+from models.wire import MSGPACK_MEDIA_TYPE, encode_msgpack, msgpack, pack_predictions, parse_text_upload, wants_msgpack
+from inference.batcher import MicroBatcher
+from inference.bucketing import DEFAULT_BUCKET_WIDTHS, bucket_key, pad_batch, padding_efficiency
+from inference.cache import PredictionCache
+from inference.tokenization import TokenizationStage
+from inference.variants import DEFAULT_VARIANT, variant_filename
+from inference.process_engine import ProcessEngine
+from inference.session_config import ExecutionConfig, SessionRunner
+from inference.session_loader import create_session, warm_up
+from inference.admission import LANES, AdmissionController, AdmissionRejected
+from inference.jobs import JobRunner, JobStore
+from inference.metrics import BATCH_SIZE_BUCKETS, RATIO_BUCKETS, Registry
 
 # MODEL_PATH = "onnx_lora_bert/model.onnx"
 # TOKENIZER_PATH = "onnx_lora_bert"
-BATCH_LIMIT = 16   # batch limit for each inference call
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", DEFAULT_VARIANT)  # fp32 | fused | int8 | fp16
+MODEL_DIR = os.getenv("MODEL_DIR")  # local folder with model variants + tokenizer; HF cache when unset
+BATCH_LIMIT = int(os.getenv("BATCH_LIMIT", 16))   # batch limit for each inference call (shared across requests)
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5.0))  # max time a sample waits for its batch to fill
 MAX_LENGTH = 128   # max token length
+BUCKET_WIDTHS = DEFAULT_BUCKET_WIDTHS  # token-length buckets, each padded to its own width
 MAX_REQUEST_SAMPLES = 128  # max samples per request
-NUM_WORKERS = 4    # number of concurrent threads
+ENGINE_MODE = os.getenv("ENGINE_MODE", "thread")  # thread: one shared session | process: sharded worker processes
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", 4))    # number of concurrent threads (worker processes in process mode)
+ENGINE_SLOTS_PER_WORKER = int(os.getenv("ENGINE_SLOTS_PER_WORKER", 2))  # shared-memory batches in flight per process
+INFERENCE_CONCURRENCY = NUM_WORKERS * (ENGINE_SLOTS_PER_WORKER if ENGINE_MODE == "process" else 1)
+STREAM_CHUNK_SIZE = BATCH_LIMIT  # samples per NDJSON flush on /predict/stream
+STREAM_MAX_INFLIGHT_CHUNKS = INFERENCE_CONCURRENCY * 2  # chunks of one stream queued at the same time
+TOKENIZER_THREADS = int(os.getenv("TOKENIZER_THREADS", 2))  # threads feeding requests to the Rust tokenizer
+TOKENIZER_PROCESSES = int(os.getenv("TOKENIZER_PROCESSES", 0))  # >0 to tokenize large requests in a process pool
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 50_000))  # texts whose token IDs are kept in memory
+ADMISSION_MAX_SAMPLES = int(os.getenv("ADMISSION_MAX_SAMPLES", 2048))  # samples admitted at once, across requests
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 20.0))  # longer expected waits are shed with Retry-After
+BULK_SHARE = float(os.getenv("BULK_SHARE", 0.75))  # share of the sample budget bulk traffic may use
 REQUEST_TIMEOUT = 90.0  # seconds
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))  # memory bound of the prediction cache
+CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH")  # optional SQLite file, keeps predictions across restarts
+GRAPH_CACHE_DIR = os.getenv(  # optimized ONNX graphs reused across boots; empty to disable
+    "GRAPH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sentiment_api", "ort_graphs")
+)
+ORT_CONFIG_PATH = os.getenv("ORT_CONFIG_PATH")  # JSON from scripts/tune_session.py; threading/memory defaults when unset
+WARMUP_BATCH_SIZES = sorted({1, BATCH_LIMIT})  # warm-up batches run at every bucket width before ready
+JOBS_DB_PATH = os.getenv(  # SQLite file with bulk jobs, their texts and checkpointed results
+    "JOBS_DB_PATH", os.path.join(os.path.expanduser("~"), ".cache", "sentiment_api", "jobs.sqlite3")
+)
+JOB_MAX_TEXTS = int(os.getenv("JOB_MAX_TEXTS", 1_000_000))  # max texts per bulk job
+JOB_CHUNK_SIZE = BATCH_LIMIT * 4  # texts admitted and scored together (one checkpoint per round of chunks)
+JOB_MAX_INFLIGHT_CHUNKS = int(os.getenv("JOB_MAX_INFLIGHT_CHUNKS", 4))  # chunks of a job in flight at once
+JOB_RESULTS_PAGE_LIMIT = 5000  # max results per GET /jobs/{id}/results page
+
 
-app = FastAPI(title="Sentiment Analysis API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background so /healthz answers while the model loads; /readyz flips once warm
+    loop = asyncio.get_running_loop()
+    loader = loop.run_in_executor(None, load_model)
+    jobs_starter = asyncio.create_task(start_jobs(loader))
+    yield
+    jobs_starter.cancel()
+    await job_runner.stop()
+    try:
+        await loader
+    except Exception:
+        pass
+    await stop_batcher()
+
+app = FastAPI(title="Sentiment Analysis API", version="1.0", lifespan=lifespan)
 
 session = None
+session_runner = None
+engine = None
 tokenizer = None
+tokenization = None
 provider = None
 
-@app.on_event("startup")
-def load_model():
-    global session, tokenizer, provider
+# starting -> ready | failed
+startup_state = {"status": "starting", "error": None, "graph_cache": None, "load_seconds": None, "warmup_seconds": None}
+
+prediction_cache = PredictionCache(max_bytes=CACHE_MAX_BYTES, disk_path=CACHE_DISK_PATH)
+job_store = JobStore(JOBS_DB_PATH)
+
+# Budgets queued work in samples, not requests; interactive traffic goes ahead of bulk
+admission = AdmissionController(
+    capacity=ADMISSION_MAX_SAMPLES,
+    max_wait=min(ADMISSION_MAX_WAIT, REQUEST_TIMEOUT),
+    lane_shares={"interactive": 1.0, "bulk": BULK_SHARE},
+)
+
+# Metrics (Prometheus text at /metrics)
+metrics = Registry(prefix="sentiment_")
+REQUEST_LATENCY = metrics.histogram("request_duration_seconds", "End-to-end HTTP request latency", labelnames=("method", "path"))
+HTTP_RESPONSES = metrics.counter("http_responses_total", "HTTP responses by status code", labelnames=("path", "status"))
+ADMISSION_WAIT = metrics.histogram("admission_wait_seconds", "Time a request waited for admission", labelnames=("lane",))
+QUEUE_WAIT = metrics.histogram("batch_queue_wait_seconds", "Time a sample waited in the micro-batch queue")
+TOKENIZE_TIME = metrics.histogram("tokenize_seconds", "Tokenization time per request")
+SESSION_RUN_TIME = metrics.histogram("session_run_seconds", "ONNX session.run time per batch")
+POSTPROCESS_TIME = metrics.histogram("postprocess_seconds", "Argmax/softmax time per batch")
+SERIALIZE_TIME = metrics.histogram("serialize_seconds", "Response encoding time", labelnames=("format",))
+BATCH_SIZE = metrics.histogram("batch_size", "Samples per ONNX batch", buckets=BATCH_SIZE_BUCKETS)
+PADDING_RATIO = metrics.histogram("padding_ratio", "Share of padded positions per ONNX batch", buckets=RATIO_BUCKETS)
+
+def load_model(variant: str = MODEL_VARIANT):
+    try:
+        _load_model(variant)
+        startup_state["status"] = "ready"
+    except Exception as e:
+        startup_state.update(status="failed", error=repr(e))
+        print(f"❌ Model '{variant}' failed to load: {e!r}")
+        raise
+
+def _load_model(variant: str):
+    global session, session_runner, engine, tokenizer, tokenization, provider
+
+    start = time.perf_counter()
+    execution_config = ExecutionConfig.load(ORT_CONFIG_PATH)
 
     provider = (
         "CUDAExecutionProvider"
@@ -36,27 +136,84 @@ def load_model():
     )
 
     HF_REPO = "khoa-tran-hcmut/sentiment_lora_bert"
+    model_file = variant_filename(variant)
+
+    if MODEL_DIR:
+        # Local folder produced by scripts/optimize_model.py
+        model_path = os.path.join(MODEL_DIR, model_file)
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
+        model_version = f"{os.path.abspath(MODEL_DIR)}/{model_file}@{int(os.path.getmtime(model_path))}"
+    else:
+        model_path = hf_hub_download(
+            repo_id=HF_REPO,
+            filename=model_file,
+            subfolder="onnx_lora_bert",
+            local_files_only=True   # 🔥 QUAN TRỌNG
+        )
+
+        # 🔥 Load tokenizer OFFLINE từ cache
+        tokenizer = AutoTokenizer.from_pretrained(
+            HF_REPO,
+            subfolder="onnx_lora_bert",
+            local_files_only=True
+        )
+
+        # Snapshot folder name is the HF commit hash: .../snapshots/<revision>/onnx_lora_bert/model.onnx
+        revision = os.path.basename(os.path.dirname(os.path.dirname(model_path)))
+        model_version = f"{HF_REPO}@{revision}/{model_file}"
 
-    model_path = hf_hub_download(
-        repo_id=HF_REPO,
-        filename="model.onnx",
-        subfolder="onnx_lora_bert",
-        local_files_only=True   # 🔥 QUAN TRỌNG
+    tokenization = TokenizationStage(
+        tokenizer,
+        max_length=MAX_LENGTH,
+        cache_size=TOKEN_CACHE_SIZE,
+        num_processes=TOKENIZER_PROCESSES,
     )
 
-    # 🔥 Load tokenizer OFFLINE từ cache
-    tokenizer = AutoTokenizer.from_pretrained(
-        HF_REPO,
-        subfolder="onnx_lora_bert",
-        local_files_only=True
+    prediction_cache.model_version = os.getenv("MODEL_VERSION", model_version)
+
+    if ENGINE_MODE == "process":
+        # Each worker process loads its own session; the API process only tokenizes and routes
+        engine = ProcessEngine(
+            model_path,
+            provider=provider,
+            num_workers=NUM_WORKERS,
+            slots_per_worker=ENGINE_SLOTS_PER_WORKER,
+            max_batch_size=BATCH_LIMIT,
+            max_length=MAX_LENGTH,
+            graph_cache_dir=GRAPH_CACHE_DIR,
+            warmup_widths=BUCKET_WIDTHS,
+            execution_config=execution_config,
+            request_timeout=REQUEST_TIMEOUT,
+        )
+        engine.start()   # returns once every worker has loaded and warmed up
+        tokenization.encode(["warm up"])
+        startup_state["graph_cache"] = "per-worker" if GRAPH_CACHE_DIR else "disabled"
+        startup_state["load_seconds"] = round(time.perf_counter() - start, 3)
+        print(f"✅ Model '{variant}' loaded in {NUM_WORKERS} worker processes on:", provider)
+        return
+
+    # INFERENCE_CONCURRENCY batches share the cores; "auto" intra-op threads split them instead of oversubscribing
+    options = execution_config.session_options(concurrency=INFERENCE_CONCURRENCY)
+    new_session, startup_state["graph_cache"] = create_session(
+        model_path, provider, GRAPH_CACHE_DIR, options, execution_config.provider_options(provider)
     )
+    startup_state["load_seconds"] = round(time.perf_counter() - start, 3)
 
-    session = ort.InferenceSession(model_path, providers=[provider])
+    start = time.perf_counter()
+    runs = warm_up(new_session, BUCKET_WIDTHS, WARMUP_BATCH_SIZES)
+    tokenization.encode(["warm up"])
+    startup_state["warmup_seconds"] = round(time.perf_counter() - start, 3)
 
-    print("✅ Model loaded on:", session.get_providers()[0])
+    session = new_session
+    session_runner = SessionRunner(session, io_binding=execution_config.io_binding)
+    print(f"✅ Model '{variant}' loaded on:", session.get_providers()[0],
+          f"(graph cache: {startup_state['graph_cache']}, {runs} warm-up batches,",
+          f"{options.intra_op_num_threads} intra-op threads x {INFERENCE_CONCURRENCY} concurrent batches)")
 
 
-executor = ThreadPoolExecutor(max_workers=NUM_WORKERS)
+executor = ThreadPoolExecutor(max_workers=INFERENCE_CONCURRENCY)
+# Separate pool so tokenizing new requests never queues behind running ONNX batches
+tokenize_executor = ThreadPoolExecutor(max_workers=TOKENIZER_THREADS)
 
 # Middleware
 app.add_middleware(
@@ -67,6 +224,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_label(request: Request) -> str:
+    # Route template ("/jobs/{job_id}"), so job IDs and scanner 404s don't each add a metrics series
+    route = request.scope.get("route")
+    return getattr(route, "path", "<unmatched>")
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
@@ -74,6 +236,9 @@ async def log_requests(request: Request, call_next):
     duration = time.time() - start_time
     # print(f"{request.method} {request.url.path} completed in {duration:.3f}s")
     response.headers["X-Execution-Time"] = f"{duration:.3f}s"
+    path = _route_label(request)
+    REQUEST_LATENCY.observe(duration, method=request.method, path=path)
+    HTTP_RESPONSES.inc(path=path, status=response.status_code)
     return response
 
 @app.middleware("http")
@@ -81,43 +246,146 @@ async def timeout_middleware(request: Request, call_next):
     try:
         return await asyncio.wait_for(call_next(request), timeout=REQUEST_TIMEOUT)
     except asyncio.TimeoutError:
+        HTTP_RESPONSES.inc(path=_route_label(request), status=504)
         return JSONResponse(status_code=504, content={"detail": "Request timed out."})
 
 
 # Inference functions
-def run_inference_batch(texts: list[str]) -> list[int]:
-    inputs = tokenizer(
-        texts,
-        return_tensors="np",
-        padding=True,
-        truncation=True,
-        max_length=MAX_LENGTH
-    )
+def run_inference_batch(sequences: list[tuple[np.ndarray, np.ndarray]]) -> list[tuple[tuple[int, list[float]], int]]:
+    pad_id = tokenizer.pad_token_id or 0
+
+    if engine is not None:
+        # Padded straight into a worker's shared-memory slot
+        with SESSION_RUN_TIME.time():
+            logits = engine.run(sequences, pad_id=pad_id)
+        padded_width = max(len(ids) for ids, _ in sequences)
+    else:
+        input_ids, attention_mask, token_type_ids = pad_batch(sequences, pad_id=pad_id)
 
-    outputs = session.run(
-        None,
-        {
-            "input_ids": inputs["input_ids"],
-            "attention_mask": inputs["attention_mask"],
-            "token_type_ids": inputs.get("token_type_ids", np.zeros_like(inputs["input_ids"])),
-        }
+        with SESSION_RUN_TIME.time():
+            # With IOBinding this is a per-thread reused buffer; it is fully consumed below
+            logits = session_runner.run(
+                {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "token_type_ids": token_type_ids,
+                }
+            )
+        padded_width = input_ids.shape[1]
+
+    BATCH_SIZE.observe(len(sequences))
+    PADDING_RATIO.observe(1.0 - sum(len(ids) for ids, _ in sequences) / (len(sequences) * padded_width))
+
+    with POSTPROCESS_TIME.time():
+        predicted_class_ids = np.argmax(logits, axis=-1).tolist()
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probabilities = np.round((exp / exp.sum(axis=-1, keepdims=True)).astype(np.float64), 4).tolist()
+    return [((pred, probs), padded_width) for pred, probs in zip(predicted_class_ids, probabilities)]
+
+# Texts from all in-flight requests share the same micro-batches, grouped by token-length bucket
+# so short comments are never padded to the width of a long one;
+# each batch still runs in the thread pool so the event loop is never blocked
+batcher = MicroBatcher(
+    run_inference_batch,
+    executor,
+    max_batch_size=BATCH_LIMIT,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_concurrent_batches=INFERENCE_CONCURRENCY,
+    key_fn=lambda seq: bucket_key(len(seq[0]), BUCKET_WIDTHS),
+    on_dispatch=lambda waits: [QUEUE_WAIT.observe(w) for w in waits],
+)
+
+# Saturation and cache gauges are read from the live objects at scrape time
+metrics.gauge("inference_busy_slots", "ONNX batches currently running", lambda: batcher.running_batches)
+metrics.gauge("inference_capacity", "Max ONNX batches running at once", lambda: INFERENCE_CONCURRENCY)
+metrics.gauge("batch_queue_size", "Samples waiting in the micro-batch queue", lambda: batcher.queue_size)
+metrics.gauge("admission_in_use_samples", "Samples currently admitted", lambda: admission.in_use)
+metrics.gauge("admission_capacity_samples", "Sample budget of the admission controller", lambda: ADMISSION_MAX_SAMPLES)
+metrics.gauge("admission_waiting_requests", "Requests waiting for admission by lane",
+              lambda: {(lane,): n for lane, n in admission.stats()["waiting"].items()}, labelnames=("lane",))
+metrics.gauge("admission_drain_rate", "Samples finished per second (recent window)", lambda: admission.drain_rate())
+metrics.callback_counter("admission_shed_total", "Requests rejected early with Retry-After by lane",
+                         lambda: {(lane,): n for lane, n in admission.shed.items()}, labelnames=("lane",))
+metrics.gauge("prediction_cache_entries", "Entries in the in-memory prediction cache",
+              lambda: prediction_cache.stats()["entries"])
+metrics.gauge("prediction_cache_bytes", "Approximate memory used by the prediction cache",
+              lambda: prediction_cache.stats()["bytes"])
+metrics.callback_counter("prediction_cache_lookups_total", "Prediction cache lookups by outcome",
+                         lambda: {(outcome,): prediction_cache.stats()[outcome]
+                                  for outcome in ("hits", "disk_hits", "coalesced", "misses")},
+                         labelnames=("outcome",))
+metrics.callback_counter("token_cache_lookups_total", "Token-ID cache lookups by outcome",
+                         lambda: {("hits",): tokenization.hits, ("misses",): tokenization.misses},
+                         labelnames=("outcome",))
+metrics.gauge("jobs", "Bulk jobs by status",
+              lambda: {(status,): n for status, n in job_store.counts().items()}, labelnames=("status",))
+metrics.gauge("ready", "1 once the model is loaded and warmed up",
+              lambda: int(startup_state["status"] == "ready"))
+metrics.callback_counter("worker_restarts_total", "Inference worker process restarts",
+                         lambda: sum(w["restarts"] for w in engine.stats()["workers"]) if engine else 0)
+
+def tokenize_texts(texts: list[str]):
+    with TOKENIZE_TIME.time():
+        return tokenization.encode(texts)
+
+async def run_inference_async(texts: list[str]) -> tuple[list[tuple[int, list[float]]], float]:
+    loop = asyncio.get_running_loop()
+    # Whole request in one Rust batch call, off the inference threads
+    sequences = await loop.run_in_executor(tokenize_executor, tokenize_texts, texts)
+
+    outputs = await batcher.submit_many(sequences)
+
+    preds = [pred for pred, _ in outputs]
+    efficiency = padding_efficiency(
+        [len(ids) for ids, _ in sequences],
+        [width for _, width in outputs]
     )
+    return preds, efficiency
+
 
-    logits = outputs[0]
-    predicted_class_ids = np.argmax(logits, axis=-1).tolist()
-    return predicted_class_ids
+async def predict_texts(texts: list[str]) -> tuple[list[tuple[int, list[float]]], float | None]:
+    # Returns one (predicted_class, probabilities) per text.
+    # Only texts that are neither cached nor in flight elsewhere reach the model
+    run_stats = {}
 
-async def run_inference_async(texts: list[str]) -> list[int]:
-    tasks = []
-    for i in range(0, len(texts), BATCH_LIMIT):
-        chunk = texts[i:i + BATCH_LIMIT]
-        # Chạy inference trong thread pool để không block event loop
-        task = asyncio.get_event_loop().run_in_executor(executor, run_inference_batch, chunk)
-        tasks.append(task)
+    async def compute(missing: list[str]) -> list[tuple[int, list[float]]]:
+        preds, run_stats["padding_efficiency"] = await run_inference_async(missing)
+        return preds
 
-    # Chờ tất cả hoàn thành
-    all_preds = await asyncio.gather(*tasks)
-    return [p for chunk in all_preds for p in chunk]
+    preds = await prediction_cache.get_or_compute(texts, compute)
+    return preds, run_stats.get("padding_efficiency")
+
+
+async def score_texts(texts: list[str]) -> list[tuple[int, list[float]]]:
+    outputs, _ = await predict_texts(texts)
+    return outputs
+
+# Bulk jobs are scored on the bulk admission lane, behind interactive /predict traffic
+job_runner = JobRunner(
+    job_store,
+    score_texts,
+    admission,
+    chunk_size=JOB_CHUNK_SIZE,
+    max_inflight_chunks=JOB_MAX_INFLIGHT_CHUNKS,
+)
+
+async def start_jobs(loader):
+    # Queued and interrupted jobs start (or resume) once the model is ready
+    try:
+        await loader
+    except Exception:
+        return
+    job_runner.start()
+
+
+async def stop_batcher():
+    await batcher.stop()
+    prediction_cache.close()
+    job_store.close()
+    if tokenization is not None:
+        tokenization.close()
+    if engine is not None:
+        engine.close()
 
 
 # API Endpoints
@@ -125,33 +393,226 @@ async def run_inference_async(texts: list[str]) -> list[int]:
 def root():
     return {"message": "Welcome to the Sentiment Analysis API. Use the /predict endpoint to analyze sentiment."}    
 
-semaphore = asyncio.Semaphore(NUM_WORKERS)
+@app.get("/healthz")
+def healthz():
+    # Liveness: the process is up; only a failed model load should get the pod restarted
+    if startup_state["status"] == "failed":
+        return JSONResponse(status_code=500, content={"status": "failed", "error": startup_state["error"]})
+    return {"status": "alive"}
 
-@app.post("/predict", response_model=PredictionResponse)
-async def predict_sentiment(text_request: TextsRequest):
+@app.get("/readyz")
+def readyz():
+    # Readiness: model loaded and warmed up at every bucket width
+    code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(status_code=code, content=startup_state)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return prediction_cache.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+class AdmittedStreamingResponse(StreamingResponse):
+    # Gives the admission ticket back however the response ends. The body generator's own
+    # finally never runs if the client leaves before the first chunk is pulled
+    def __init__(self, ticket, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self.ticket)
+
+async def admit(request: Request, cost: int):
+    if startup_state["status"] == "failed":
+        raise HTTPException(503, "Model failed to load.")
+    if startup_state["status"] != "ready":
+        raise HTTPException(503, "Model is still loading.", headers={"Retry-After": "5"})
+
+    # Lane comes from the X-Priority header: interactive (default) or bulk.
+    # Checked before it becomes a metric label, so clients can't create label series
+    lane = request.headers.get("X-Priority", "interactive").strip().lower()
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority lane '{lane}' (expected one of: {', '.join(LANES)})")
     try:
-        await asyncio.wait_for(semaphore.acquire(), timeout=20)
-    except asyncio.TimeoutError:
-        raise HTTPException(429, "Too many concurrent requests")
+        with ADMISSION_WAIT.time(lane=lane):
+            return await admission.acquire(cost, lane)
+    except AdmissionRejected as e:
+        raise HTTPException(429, e.detail, headers={"Retry-After": str(e.retry_after)})
+
+@app.post("/predict", response_model=PredictionResponse)
+async def predict_sentiment(
+    text_request: TextsRequest,
+    request: Request,
+    compact: bool = False,
+    probabilities: bool = False,
+):
+    # Response formats:
+    #   default                       PredictionResponse JSON (texts echoed back)
+    #   ?compact=true                 JSON with only class IDs, no text echo
+    #   Accept: application/x-msgpack packed uint8 class IDs (+ float16 probabilities)
+    # ?probabilities=true adds class probabilities to any of them
+    texts = text_request.texts
+
+    if not texts:
+        raise HTTPException(status_code=400, detail="Empty input list.")
+
+    if len(texts) > MAX_REQUEST_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_REQUEST_SAMPLES} samples).")
+
+    if wants_msgpack(request.headers.get("accept")) and msgpack is None:
+        raise HTTPException(status_code=406, detail="msgpack responses are not available on this server.")
+
+    ticket = await admit(request, len(texts))
 
     try:
-        texts = text_request.texts
-
-        if not texts:
-            raise HTTPException(status_code=400, detail="Empty input list.")
-        
-        if len(texts) > MAX_REQUEST_SAMPLES:
-            raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_REQUEST_SAMPLES} samples).")
-
-        preds = await run_inference_async(texts)
-        
-        results = [
-            {"text": text, "predicted_class": int(pred)}
-            for text, pred in zip(texts, preds)
-        ]
-
-        return {"batch_size": len(texts),
-                "results": results}
+        outputs, efficiency = await predict_texts(texts)
+        preds = [int(pred) for pred, _ in outputs]
+        probs = [probs for _, probs in outputs] if probabilities else None
+
+        if wants_msgpack(request.headers.get("accept")):
+            with SERIALIZE_TIME.time(format="msgpack"):
+                payload = pack_predictions(preds, probs)
+                payload["padding_efficiency"] = efficiency
+                return Response(content=encode_msgpack(payload), media_type=MSGPACK_MEDIA_TYPE)
+
+        if compact:
+            with SERIALIZE_TIME.time(format="compact_json"):
+                payload = {"batch_size": len(texts), "predicted_class": preds, "padding_efficiency": efficiency}
+                if probs is not None:
+                    payload["probabilities"] = probs
+                return JSONResponse(payload)
+
+        with SERIALIZE_TIME.time(format="json"):
+            results = [
+                {"text": text, "predicted_class": pred}
+                for text, pred in zip(texts, preds)
+            ]
+            if probs is not None:
+                for result, p in zip(results, probs):
+                    result["probabilities"] = p
+
+            # Already matches PredictionResponse; skip re-validating every result through pydantic
+            return JSONResponse({"batch_size": len(texts),
+                                 "results": results,
+                                 "padding_efficiency": efficiency})
     
     finally:
-        semaphore.release()
\ No newline at end of file
+        admission.release(ticket)
+
+
+@app.post("/predict/stream")
+async def predict_sentiment_stream(text_request: TextsRequest, request: Request):
+    # No MAX_REQUEST_SAMPLES cap: results are written as NDJSON lines ({"index", "predicted_class"})
+    # in completion order, as soon as each micro-batch finishes
+    texts = text_request.texts
+
+    if not texts:
+        raise HTTPException(status_code=400, detail="Empty input list.")
+
+    # A stream never has more than its window of chunks in flight, so that is what it costs
+    ticket = await admit(request, min(len(texts), STREAM_CHUNK_SIZE * STREAM_MAX_INFLIGHT_CHUNKS))
+
+    async def predict_chunk(start: int):
+        outputs, _ = await predict_texts(texts[start:start + STREAM_CHUNK_SIZE])
+        return start, [pred for pred, _ in outputs]
+
+    async def generate():
+        starts = iter(range(0, len(texts), STREAM_CHUNK_SIZE))
+        running = set()
+
+        try:
+            while True:
+                # Sliding window of chunks, so huge inputs don't flood the batcher queue at once
+                for start in starts:
+                    running.add(asyncio.create_task(predict_chunk(start)))
+                    if len(running) >= STREAM_MAX_INFLIGHT_CHUNKS:
+                        break
+                if not running:
+                    break
+
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    start, preds = task.result()
+                    yield "".join(
+                        json.dumps({"index": start + i, "predicted_class": int(pred)}) + "\n"
+                        for i, pred in enumerate(preds)
+                    )
+
+        except Exception as e:
+            yield json.dumps({"error": f"Inference failed: {e}"}) + "\n"
+
+        finally:
+            for task in running:
+                task.cancel()
+
+    return AdmittedStreamingResponse(ticket, generate(), media_type="application/x-ndjson")
+
+
+# Bulk jobs
+async def _create_job(texts: list[str]):
+    if not texts:
+        raise HTTPException(status_code=400, detail="Empty input list.")
+    if len(texts) > JOB_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"Job too large (max {JOB_MAX_TEXTS} texts).")
+
+    job = await asyncio.to_thread(job_store.create, texts)
+    job_runner.notify()   # on the event loop: the runner's wakeup is an asyncio.Event
+    return JSONResponse(status_code=202, content=job, headers={"Location": f"/jobs/{job['job_id']}"})
+
+def _get_job(job_id: str) -> dict:
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(text_request: TextsRequest):
+    # No MAX_REQUEST_SAMPLES cap: texts are stored and scored in the background at bulk priority
+    return await _create_job(text_request.texts)
+
+@app.post("/jobs/upload", status_code=202)
+async def upload_job(request: Request):
+    # Raw file body: text/csv, application/x-ndjson or plain text (one comment per line)
+    try:
+        texts = parse_text_upload(await request.body(), request.headers.get("content-type"))
+    except ValueError as e:   # includes UnicodeDecodeError and JSON errors
+        raise HTTPException(status_code=400, detail=f"Could not parse upload: {e}")
+    return await _create_job(texts)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return await asyncio.to_thread(_get_job, job_id)
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = 0, limit: int = 1000, probabilities: bool = False):
+    # Pages of scored results in index order; `next_offset` is the cursor for the next page
+    # (None once the job is done and everything after `offset` has been returned)
+    if offset < 0 or not 0 < limit <= JOB_RESULTS_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Need offset >= 0 and 0 < limit <= {JOB_RESULTS_PAGE_LIMIT}.")
+
+    job = await asyncio.to_thread(_get_job, job_id)
+    rows = await asyncio.to_thread(job_store.results, job_id, offset, limit)
+
+    results = []
+    for idx, pred, probs in rows:
+        result = {"index": idx, "predicted_class": pred}
+        if probabilities:
+            result["probabilities"] = probs
+        results.append(result)
+
+    next_offset = rows[-1][0] + 1 if rows else offset
+    if job["status"] in ("done", "failed") and (len(rows) < limit or next_offset >= job["total"]):
+        next_offset = None
+
+    return JSONResponse({"job_id": job_id, "status": job["status"], "results": results, "next_offset": next_offset})
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    if not await asyncio.to_thread(job_store.delete, job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {"job_id": job_id, "deleted": True}
@@ -0,0 +1,28 @@
+import random
+
+# Token-ish vocabulary that looks like YouTube comments
+_WORDS = (
+    "great video love this so good thanks for sharing first who is here in 2026 "
+    "the music at the end was amazing i do not agree with this part honestly "
+    "worst explanation ever can you make a tutorial about that please more "
+    "content like this bro lol this is why i subscribed underrated channel "
+    "audio is too quiet the editing is insane waiting for part two"
+).split()
+
+_SHORT_COMMENTS = ["first", "great video!", "❤️❤️", "lol", "who's here in 2026", "nice", "W video"]
+
+
+def comment_length(rng: random.Random) -> int:
+    # Heavily skewed: most comments are a few words, a long tail runs past the 128-token limit
+    return max(1, min(int(rng.lognormvariate(2.0, 1.0)), 300))
+
+
+def synthetic_comments(n: int, seed: int = 0, duplicate_rate: float = 0.1) -> list[str]:
+    rng = random.Random(seed)
+    comments = []
+    for _ in range(n):
+        if comments and rng.random() < duplicate_rate:
+            comments.append(rng.choice(_SHORT_COMMENTS))
+            continue
+        comments.append(" ".join(rng.choice(_WORDS) for _ in range(comment_length(rng))))
+    return comments
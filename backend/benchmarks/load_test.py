@@ -0,0 +1,322 @@
+"""
+Load test of the sentiment API: throughput and p50/p95/p99 latency per configuration.
+
+Every configuration (BATCH_LIMIT x NUM_WORKERS x ENGINE_MODE x variant) gets its own uvicorn
+server on a free local port, serving a generated stand-in BERT unless --model-dir is given.
+Once /readyz is green, synthetic comments are replayed as /predict requests at each
+concurrency level (closed loop: every client sends its next request when the last one returns).
+Results are appended to a JSONL file; --report prints everything stored so far.
+
+Usage (from the backend folder):
+    python -m benchmarks.load_test --concurrency 1 8 32
+    python -m benchmarks.load_test --batch-limit 8 16 32 --num-workers 2 4 --engine-mode thread process
+    python -m benchmarks.load_test --model-dir onnx_lora_bert --variant fp32 int8
+    python -m benchmarks.load_test --report
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.corpus import synthetic_comments
+from benchmarks.stand_in_model import build_stand_in
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "results", "load_test.jsonl")
+
+
+# =========================
+# Server under test
+# =========================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """uvicorn subprocess with the given env overrides; ready once /readyz returns 200."""
+
+    def __init__(self, env, ready_timeout=300.0):
+        self.port = free_port()
+        self.env = {**os.environ, "PYTHONUNBUFFERED": "1", **{k: str(v) for k, v in env.items()}}
+        self.ready_timeout = ready_timeout
+        self.process = None
+        self.log = None
+        self.ready_seconds = None
+
+    def __enter__(self):
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+        start = time.perf_counter()
+        while time.perf_counter() - start < self.ready_timeout:
+            if self.process.poll() is not None:
+                break
+            try:
+                status, _ = request(self.connect(), "GET", "/readyz")
+                if status == 200:
+                    self.ready_seconds = round(time.perf_counter() - start, 3)
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"Server did not become ready:\n{self.output()[-3000:]}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.log:
+            self.log.close()
+            self.log = None
+
+    def connect(self):
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+
+    def output(self) -> str:
+        self.log.seek(0)
+        return self.log.read().decode("utf-8", "replace")
+
+
+def request(conn, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+HISTOGRAMS = ("batch_size", "padding_ratio")
+
+
+def scrape_histograms(server) -> dict:
+    # {name: (sum, count)} of the server's unlabelled Prometheus histograms
+    _, body = request(server.connect(), "GET", "/metrics")
+    values = {}
+    for line in body.decode("utf-8").splitlines():
+        if not line.startswith("#"):
+            name, _, value = line.partition(" ")
+            values[name] = float(value)
+    return {
+        metric: (values.get(f"sentiment_{metric}_sum", 0.0), values.get(f"sentiment_{metric}_count", 0.0))
+        for metric in HISTOGRAMS
+    }
+
+
+def histogram_means(before, after) -> dict:
+    # Means over the samples observed between two scrapes
+    means = {}
+    for metric in HISTOGRAMS:
+        total = after[metric][0] - before[metric][0]
+        count = after[metric][1] - before[metric][1]
+        means[f"mean_{metric}"] = round(total / count, 3) if count else None
+    return means
+
+
+# =========================
+# Load generation
+# =========================
+def replay(server, payloads, concurrency) -> tuple[list[tuple[float, int, int]], float]:
+    """Closed-loop replay; returns ([(latency_s, status, n_texts)], wall_seconds)."""
+    samples = []
+    lock = threading.Lock()
+    next_payload = iter(payloads)
+
+    def client():
+        conn = server.connect()
+        while True:
+            with lock:
+                payload = next(next_payload, None)
+            if payload is None:
+                break
+            start = time.perf_counter()
+            try:
+                status, _ = request(conn, "POST", "/predict", payload)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                conn.close()
+                conn = server.connect()
+            latency = time.perf_counter() - start
+            with lock:
+                samples.append((latency, status, len(payload["texts"])))
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall) -> dict:
+    ok = [(latency, n) for latency, status, n in samples if status == 200]
+    latencies = np.array([latency for latency, _ in ok]) * 1000
+    errors = {}
+    for _, status, _ in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "requests_per_s": round(len(ok) / wall, 2),
+        "texts_per_s": round(sum(n for _, n in ok) / wall, 1),
+    }
+    if len(latencies):
+        summary.update({
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "mean_ms": round(float(latencies.mean()), 2),
+            "max_ms": round(float(latencies.max()), 2),
+        })
+    return summary
+
+
+def make_payloads(num_requests, request_size, seed, duplicate_rate):
+    texts = synthetic_comments(num_requests * request_size, seed=seed, duplicate_rate=duplicate_rate)
+    return [{"texts": texts[i:i + request_size]} for i in range(0, len(texts), request_size)]
+
+
+# =========================
+# Results
+# =========================
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path, row):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(row) + "\n")
+
+
+def print_report(path):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    header = (f"{'run':<19} {'model':<9} {'variant':<7} {'mode':<7} {'batch':>5} {'workers':>7} {'conc':>5} "
+              f"{'texts/s':>9} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'batch~':>6} {'errors'}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        cfg, res = row["config"], row["result"]
+        print(
+            f"{row['timestamp']:<19} {cfg['model']:<9} {cfg['variant']:<7} {cfg['engine_mode']:<7} "
+            f"{cfg['batch_limit']:>5} {cfg['num_workers']:>7} {cfg['concurrency']:>5} "
+            f"{res['texts_per_s']:>9} {res['requests_per_s']:>8} {res.get('p50_ms', '-'):>8} "
+            f"{res.get('p95_ms', '-'):>8} {res.get('p99_ms', '-'):>8} {res.get('mean_batch_size') or '-':>6} "
+            f"{res['errors'] or ''}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", help="Folder with real model variants + tokenizer (default: generated stand-in)")
+    parser.add_argument("--variant", nargs="+", default=["fp32"])
+    parser.add_argument("--batch-limit", nargs="+", type=int, default=[16])
+    parser.add_argument("--num-workers", nargs="+", type=int, default=[4])
+    parser.add_argument("--engine-mode", nargs="+", default=["thread"], choices=["thread", "process"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--request-size", type=int, default=16, help="Comments per /predict request")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--cache", action="store_true", help="Keep the prediction cache on (off by default)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSONL file results are appended to")
+    parser.add_argument("--report", action="store_true", help="Print stored results and exit")
+    args = parser.parse_args()
+
+    if args.report:
+        print_report(args.output)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir or build_stand_in(os.path.join(tmp, "stand_in"), args.variant)
+        graph_cache = os.path.join(tmp, "graphs")
+        commit = git_commit()
+
+        for variant, mode, batch_limit, workers in itertools.product(
+            args.variant, args.engine_mode, args.batch_limit, args.num_workers
+        ):
+            # Every file the server writes stays in the temp dir: it must never resume the developer's
+            # queued jobs or read their cached predictions
+            run_dir = tempfile.mkdtemp(dir=tmp)
+            env = {
+                "MODEL_DIR": model_dir,
+                "MODEL_VARIANT": variant,
+                "MODEL_VERSION": f"load-test-{variant}",
+                "ENGINE_MODE": mode,
+                "BATCH_LIMIT": batch_limit,
+                "NUM_WORKERS": workers,
+                "GRAPH_CACHE_DIR": graph_cache,
+                "JOBS_DB_PATH": os.path.join(run_dir, "jobs.sqlite3"),
+                "CACHE_DISK_PATH": os.path.join(run_dir, "predictions.sqlite3"),
+            }
+            if not args.cache:
+                env["CACHE_MAX_BYTES"] = 0
+
+            print(f"▶ variant={variant} mode={mode} BATCH_LIMIT={batch_limit} NUM_WORKERS={workers}")
+            with Server(env) as server:
+                # Warm the HTTP path and connection handling before timing
+                replay(server, make_payloads(8, args.request_size, seed=-1, duplicate_rate=0.0), 4)
+
+                for level, concurrency in enumerate(args.concurrency):
+                    # Fresh comments per level, so earlier levels never warm caches for later ones
+                    payloads = make_payloads(args.requests, args.request_size, level, args.duplicate_rate)
+                    before = scrape_histograms(server)
+                    samples, wall = replay(server, payloads, concurrency)
+                    result = summarize(samples, wall)
+                    result.update(histogram_means(before, scrape_histograms(server)))
+
+                    row = {
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "commit": commit,
+                        "host": {"cpus": os.cpu_count(), "machine": platform.machine(), "python": platform.python_version()},
+                        "config": {
+                            "model": "real" if args.model_dir else "stand-in",
+                            "variant": variant,
+                            "engine_mode": mode,
+                            "batch_limit": batch_limit,
+                            "num_workers": workers,
+                            "concurrency": concurrency,
+                            "request_size": args.request_size,
+                            "cache": args.cache,
+                        },
+                        "ready_seconds": server.ready_seconds,
+                        "result": result,
+                    }
+                    save(args.output, row)
+                    print(f"  conc={concurrency:<4} {result['texts_per_s']:>9} texts/s  "
+                          f"p50 {result.get('p50_ms')} ms  p95 {result.get('p95_ms')} ms  "
+                          f"p99 {result.get('p99_ms')} ms  errors {result['errors'] or 0}")
+
+    print(f"✅ Results appended to {args.output} (python -m benchmarks.load_test --report)")
+
+
+if __name__ == "__main__":
+    main()
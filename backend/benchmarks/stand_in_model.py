@@ -0,0 +1,168 @@
+"""
+Small randomly initialized BERT classifier + WordPiece tokenizer, built offline.
+
+Same inputs/outputs as the real export (input_ids, attention_mask, token_type_ids -> logits [B, 3])
+and the same compute shape (embeddings, self-attention quadratic in sequence length, GELU FFN),
+just narrower and shallower, so the API can be load-tested without downloading the model.
+
+Usage (from the backend folder):
+    python -m benchmarks.stand_in_model --output-dir /tmp/stand_in
+"""
+import argparse
+import os
+
+import numpy as np
+
+from benchmarks.corpus import _SHORT_COMMENTS, _WORDS
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def build_vocab() -> list[str]:
+    chars = sorted(set("abcdefghijklmnopqrstuvwxyz0123456789!?.,'❤️"))
+    words = sorted(set(_WORDS) | {w.strip("!?'").lower() for c in _SHORT_COMMENTS for w in c.split()})
+    return SPECIAL_TOKENS + [w for w in words if w] + chars + ["##" + c for c in chars]
+
+
+class _GraphBuilder:
+    def __init__(self, rng):
+        from onnx import numpy_helper
+
+        self.rng = rng
+        self.numpy_helper = numpy_helper
+        self.nodes = []
+        self.initializers = []
+        self._count = 0
+
+    def name(self, prefix):
+        self._count += 1
+        return f"{prefix}_{self._count}"
+
+    def const(self, value, prefix="const"):
+        name = self.name(prefix)
+        self.initializers.append(self.numpy_helper.from_array(np.asarray(value), name))
+        return name
+
+    def weight(self, shape, std=0.02, prefix="w"):
+        return self.const(self.rng.normal(0.0, std, shape).astype(np.float32), prefix)
+
+    def op(self, op_type, inputs, **attrs):
+        from onnx import helper
+
+        out = self.name(op_type.lower())
+        self.nodes.append(helper.make_node(op_type, inputs, [out], **attrs))
+        return out
+
+    def dense(self, x, n_in, n_out, std=0.02):
+        return self.op("Add", [self.op("MatMul", [x, self.weight((n_in, n_out), std)]),
+                               self.const(np.zeros(n_out, np.float32), "b")])
+
+    def layer_norm(self, x, hidden):
+        return self.op("LayerNormalization", [x, self.const(np.ones(hidden, np.float32), "gamma"),
+                                              self.const(np.zeros(hidden, np.float32), "beta")],
+                       axis=-1, epsilon=1e-12)
+
+
+def build_model(path, vocab_size, hidden_size=128, num_layers=2, num_heads=2, intermediate_size=512,
+                max_position=512, num_labels=3, seed=0):
+    import onnx
+    from onnx import TensorProto, helper
+
+    g = _GraphBuilder(np.random.default_rng(seed))
+    head_dim = hidden_size // num_heads
+
+    # Embeddings: word + position + token type
+    word = g.op("Gather", [g.weight((vocab_size, hidden_size)), "input_ids"])
+    seq_len = g.op("Gather", [g.op("Shape", ["input_ids"]), g.const(np.int64(1))], axis=0)
+    positions = g.op("Range", [g.const(np.int64(0)), seq_len, g.const(np.int64(1))])
+    position = g.op("Gather", [g.weight((max_position, hidden_size)), positions])
+    token_type = g.op("Gather", [g.weight((2, hidden_size)), "token_type_ids"])
+    x = g.layer_norm(g.op("Add", [g.op("Add", [word, position]), token_type]), hidden_size)
+
+    # Additive attention mask [B, 1, 1, L]: 0 for tokens, -10000 for padding
+    mask = g.op("Cast", ["attention_mask"], to=TensorProto.FLOAT)
+    mask = g.op("Mul", [g.op("Sub", [g.const(np.float32(1.0)), mask]), g.const(np.float32(-10000.0))])
+    mask = g.op("Unsqueeze", [mask, g.const(np.array([1, 2], np.int64))])
+
+    split_heads = g.const(np.array([0, 0, num_heads, head_dim], np.int64))
+    merge_heads = g.const(np.array([0, 0, hidden_size], np.int64))
+    scale = g.const(np.float32(1.0 / np.sqrt(head_dim)))
+
+    for _ in range(num_layers):
+        q = g.op("Transpose", [g.op("Reshape", [g.dense(x, hidden_size, hidden_size), split_heads])], perm=[0, 2, 1, 3])
+        k = g.op("Transpose", [g.op("Reshape", [g.dense(x, hidden_size, hidden_size), split_heads])], perm=[0, 2, 3, 1])
+        v = g.op("Transpose", [g.op("Reshape", [g.dense(x, hidden_size, hidden_size), split_heads])], perm=[0, 2, 1, 3])
+
+        scores = g.op("Add", [g.op("Mul", [g.op("MatMul", [q, k]), scale]), mask])
+        context = g.op("MatMul", [g.op("Softmax", [scores], axis=-1), v])
+        context = g.op("Reshape", [g.op("Transpose", [context], perm=[0, 2, 1, 3]), merge_heads])
+        x = g.layer_norm(g.op("Add", [g.dense(context, hidden_size, hidden_size), x]), hidden_size)
+
+        # GELU (erf form, as in BERT)
+        h = g.dense(x, hidden_size, intermediate_size)
+        gelu = g.op("Erf", [g.op("Div", [h, g.const(np.float32(np.sqrt(2.0)))])])
+        h = g.op("Mul", [g.op("Mul", [h, g.const(np.float32(0.5))]), g.op("Add", [gelu, g.const(np.float32(1.0))])])
+        x = g.layer_norm(g.op("Add", [g.dense(h, intermediate_size, hidden_size), x]), hidden_size)
+
+    # Pooler on [CLS] + classifier; a wide classifier init so the random model predicts all classes
+    cls = g.op("Gather", [x, g.const(np.int64(0))], axis=1)
+    pooled = g.op("Tanh", [g.dense(cls, hidden_size, hidden_size, std=0.5)])
+    logits = g.dense(pooled, hidden_size, num_labels, std=0.5)
+    g.nodes.append(helper.make_node("Identity", [logits], ["logits"]))
+
+    inputs = [
+        helper.make_tensor_value_info(name, TensorProto.INT64, ["batch", "sequence"])
+        for name in ("input_ids", "attention_mask", "token_type_ids")
+    ]
+    output = helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["batch", num_labels])
+    graph = helper.make_graph(g.nodes, "stand_in_bert", inputs, [output], g.initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8   # loadable by older onnxruntime releases too
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
+
+
+def build_stand_in(output_dir, variants=("fp32",), **model_kwargs) -> str:
+    """Write model(s) + tokenizer files to `output_dir`, laid out like an MODEL_DIR for the API."""
+    from transformers import BertTokenizerFast
+
+    from inference.variants import variant_filename
+
+    os.makedirs(output_dir, exist_ok=True)
+    vocab = build_vocab()
+    vocab_path = os.path.join(output_dir, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab) + "\n")
+    BertTokenizerFast(vocab_path).save_pretrained(output_dir)
+
+    fp32_path = build_model(os.path.join(output_dir, variant_filename("fp32")), len(vocab), **model_kwargs)
+
+    for variant in variants:
+        if variant == "fp32":
+            continue
+        if variant != "int8":
+            raise ValueError(f"Stand-in model only supports fp32 and int8 (got '{variant}'); "
+                             "build other variants with scripts.optimize_model and pass --model-dir")
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, os.path.join(output_dir, variant_filename("int8")), weight_type=QuantType.QInt8)
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--variants", nargs="+", default=["fp32"], choices=["fp32", "int8"])
+    parser.add_argument("--hidden-size", type=int, default=128)
+    parser.add_argument("--num-layers", type=int, default=2)
+    parser.add_argument("--num-heads", type=int, default=2)
+    args = parser.parse_args()
+
+    build_stand_in(args.output_dir, args.variants, hidden_size=args.hidden_size,
+                   num_layers=args.num_layers, num_heads=args.num_heads)
+    print(f"✅ Stand-in model written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Tokenization vs session.run time, before and after the request-level tokenization stage.
+
+Usage (from the backend folder):
+    python -m benchmarks.tokenize_bench --samples 2048
+    python -m benchmarks.tokenize_bench --model-dir onnx_lora_bert --processes 2
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import onnxruntime as ort
+from huggingface_hub import hf_hub_download
+from transformers import AutoTokenizer
+
+from benchmarks.corpus import synthetic_comments
+from inference.bucketing import bucket_key, pad_batch
+from inference.tokenization import TokenizationStage
+
+HF_REPO = "khoa-tran-hcmut/sentiment_lora_bert"
+BATCH_LIMIT = 16
+MAX_LENGTH = 128
+
+
+def load(model_dir=None):
+    if model_dir:
+        model_path = f"{model_dir}/model.onnx"
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    else:
+        model_path = hf_hub_download(HF_REPO, "model.onnx", subfolder="onnx_lora_bert", local_files_only=True)
+        tokenizer = AutoTokenizer.from_pretrained(HF_REPO, subfolder="onnx_lora_bert", local_files_only=True)
+    session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    return session, tokenizer
+
+
+def run_session(session, input_ids, attention_mask, token_type_ids):
+    return session.run(None, {
+        "input_ids": input_ids,
+        "attention_mask": attention_mask,
+        "token_type_ids": token_type_ids,
+    })
+
+
+def bench_before(session, tokenizer, texts, workers):
+    # Old path: every 16-text chunk tokenized separately, padded to its longest member
+    timings = {"tokenize": 0.0, "session_run": 0.0}
+
+    def run_chunk(chunk):
+        t0 = time.perf_counter()
+        inputs = tokenizer(chunk, return_tensors="np", padding=True, truncation=True, max_length=MAX_LENGTH)
+        t1 = time.perf_counter()
+        run_session(
+            session,
+            inputs["input_ids"],
+            inputs["attention_mask"],
+            inputs.get("token_type_ids", np.zeros_like(inputs["input_ids"])),
+        )
+        t2 = time.perf_counter()
+        return t1 - t0, t2 - t1
+
+    chunks = [texts[i:i + BATCH_LIMIT] for i in range(0, len(texts), BATCH_LIMIT)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for tok, run in pool.map(run_chunk, chunks):
+            timings["tokenize"] += tok
+            timings["session_run"] += run
+    timings["wall"] = time.perf_counter() - start
+    return timings
+
+
+def bench_after(session, stage, texts, workers):
+    # New path: one encode call for the whole request, then length-bucketed padding
+    timings = {"tokenize": 0.0, "session_run": 0.0}
+
+    start = time.perf_counter()
+    sequences = stage.encode(texts)
+    timings["tokenize"] = time.perf_counter() - start
+
+    buckets = {}
+    for seq in sequences:
+        buckets.setdefault(bucket_key(len(seq[0])), []).append(seq)
+    batches = [
+        group[i:i + BATCH_LIMIT]
+        for group in buckets.values()
+        for i in range(0, len(group), BATCH_LIMIT)
+    ]
+
+    def run_batch(batch):
+        t0 = time.perf_counter()
+        run_session(session, *pad_batch(batch))
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        timings["session_run"] = sum(pool.map(run_batch, batches))
+    timings["wall"] = time.perf_counter() - start
+    return timings
+
+
+def report(name, timings, n):
+    print(
+        f"{name:<14} tokenize {timings['tokenize'] * 1000:9.1f} ms | "
+        f"session.run {timings['session_run'] * 1000:9.1f} ms | "
+        f"wall {timings['wall'] * 1000:9.1f} ms | "
+        f"{n / timings['wall']:8.1f} texts/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", help="Local folder with model.onnx and tokenizer files (default: HF cache)")
+    parser.add_argument("--samples", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=0, help="Tokenizer process pool size (0 = in-thread)")
+    args = parser.parse_args()
+
+    session, tokenizer = load(args.model_dir)
+    texts = synthetic_comments(args.samples)
+    stage = TokenizationStage(tokenizer, max_length=MAX_LENGTH, num_processes=args.processes)
+
+    # Warm up kernels and the process pool before timing
+    bench_after(session, stage, texts[:64], args.workers)
+    stage.clear_cache()
+
+    print(f"{args.samples} synthetic comments, {args.workers} inference threads")
+    report("before", bench_before(session, tokenizer, texts, args.workers), len(texts))
+    report("after (cold)", bench_after(session, stage, texts, args.workers), len(texts))
+    report("after (warm)", bench_after(session, stage, texts, args.workers), len(texts))
+    stage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+LANES = ("interactive", "bulk")   # in priority order
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, detail, retry_after):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("cost", "lane", "admitted_at")
+
+    def __init__(self, cost, lane):
+        self.cost = cost
+        self.lane = lane
+        self.admitted_at = None
+
+
+class AdmissionController:
+    """
+    Sample-weighted admission control with priority lanes.
+
+    Every request costs its number of samples; at most `capacity` samples are
+    admitted at once, and a lane may only use its share of that budget
+    (bulk traffic always leaves headroom for interactive requests). Waiting
+    requests are admitted in lane priority order, FIFO within a lane.
+
+    The drain rate (samples/sec finished over the last `rate_window` seconds)
+    turns the backlog into a wait estimate: requests that could not start
+    within `max_wait` are rejected on arrival with a Retry-After hint,
+    instead of timing out later.
+    """
+
+    def __init__(self, capacity, max_wait=20.0, lane_shares=None, initial_rate=100.0, rate_window=10.0):
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.lane_shares = lane_shares or {"interactive": 1.0, "bulk": 0.75}
+        self.initial_rate = initial_rate
+        self.rate_window = rate_window
+
+        self.in_use = 0
+        self._waiting = {lane: deque() for lane in LANES}   # (ticket, future)
+        self._completed = deque()   # (finished_at, cost)
+
+        self.admitted = {lane: 0 for lane in LANES}
+        self.shed = {lane: 0 for lane in LANES}
+
+    # =========================
+    # Drain rate and estimates
+    # =========================
+    def drain_rate(self) -> float:
+        now = time.monotonic()
+        while self._completed and self._completed[0][0] < now - self.rate_window:
+            self._completed.popleft()
+        if not self._completed:
+            return self.initial_rate
+
+        done = sum(cost for _, cost in self._completed)
+        elapsed = max(now - self._completed[0][0], 1.0)
+        return max(done / elapsed, 1.0)
+
+    def _backlog(self, lane) -> int:
+        # Work that must drain before a new request in `lane` can start
+        ahead = LANES[:LANES.index(lane) + 1]
+        return self.in_use + sum(t.cost for l in ahead for t, _ in self._waiting[l])
+
+    def estimated_wait(self, cost, lane="interactive") -> float:
+        limit = self._limit(lane)
+        excess = self._backlog(lane) + cost - limit
+        return max(excess, 0) / self.drain_rate()
+
+    def retry_after(self, cost, lane="interactive") -> int:
+        return max(1, math.ceil(self.estimated_wait(cost, lane)))
+
+    def _limit(self, lane) -> int:
+        return max(1, int(self.capacity * self.lane_shares.get(lane, 1.0)))
+
+    # =========================
+    # Acquire / release
+    # =========================
+    def _fits(self, ticket) -> bool:
+        # A request larger than its lane budget is admitted alone rather than never
+        return self.in_use == 0 or self.in_use + ticket.cost <= self._limit(ticket.lane)
+
+    def _grant(self):
+        for lane in LANES:
+            queue = self._waiting[lane]
+            while queue and queue[0][1].done():
+                queue.popleft()   # cancelled / timed out
+            while queue and self._fits(queue[0][0]):
+                ticket, future = queue.popleft()
+                if future.done():
+                    continue
+                self._admit(ticket)
+                future.set_result(ticket)
+            if queue:
+                return   # never let a lower lane overtake a waiting higher-priority request
+
+    def _admit(self, ticket):
+        self.in_use += ticket.cost
+        ticket.admitted_at = time.monotonic()
+        self.admitted[ticket.lane] += 1
+
+    async def acquire(self, cost, lane="interactive") -> _Ticket:
+        if lane not in self._waiting:
+            raise ValueError(f"Unknown priority lane '{lane}'")
+
+        ticket = _Ticket(max(1, cost), lane)
+        higher_waiting = any(self._waiting[l] for l in LANES[:LANES.index(lane) + 1])
+
+        if not higher_waiting and self._fits(ticket):
+            self._admit(ticket)
+            return ticket
+
+        wait = self.estimated_wait(ticket.cost, lane)
+        if wait > self.max_wait:
+            self.shed[lane] += 1
+            raise AdmissionRejected(
+                f"Server is overloaded (estimated wait {wait:.1f}s)", self.retry_after(ticket.cost, lane)
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[lane].append((ticket, future))
+        try:
+            return await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.shed[lane] += 1
+            raise AdmissionRejected(
+                "Timed out waiting for capacity", self.retry_after(ticket.cost, lane)
+            ) from None
+        except asyncio.CancelledError:
+            # Cancelled right after being granted: give the budget back
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            raise
+
+    def release(self, ticket):
+        self.in_use -= ticket.cost
+        self._completed.append((time.monotonic(), ticket.cost))
+        self._grant()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "drain_rate": round(self.drain_rate(), 1),
+            "waiting": {lane: len(q) for lane, q in self._waiting.items()},
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
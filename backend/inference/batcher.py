@@ -0,0 +1,173 @@
+import asyncio
+from collections import deque
+
+
+class MicroBatcher:
+    """
+    Central batching engine shared by all in-flight requests.
+
+    Items submitted by concurrent requests are queued together and cut into
+    batches of up to `max_batch_size`. A batch is dispatched as soon as it is
+    full, or when its oldest item has waited `max_wait_ms`. Each batch is run
+    with a single `run_batch(items)` call in `executor`, and every result is
+    sent back to the request that owns the item.
+
+    If `key_fn` is given, items are queued per key (e.g. token-length bucket)
+    and a batch only ever contains items that share the same key.
+    If `on_dispatch` is given, it is called with the list of queue waits (seconds)
+    of every batch that is sent to the executor.
+    """
+
+    def __init__(self, run_batch, executor, max_batch_size=16, max_wait_ms=5.0, max_concurrent_batches=4,
+                 key_fn=None, on_dispatch=None):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrent_batches = max_concurrent_batches
+        self.key_fn = key_fn
+        self.on_dispatch = on_dispatch
+        self.running_batches = 0
+
+        self._queues = {}   # key -> deque of (item, future, enqueued_at)
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_concurrent_batches)
+        self._task = None
+
+    # =========================
+    # Public API
+    # =========================
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for queue in self._queues.values():
+            while queue:
+                _, future, _ = queue.popleft()
+                if not future.done():
+                    future.set_exception(RuntimeError("Batcher stopped"))
+        self._queues.clear()
+
+    async def submit_many(self, items: list) -> list:
+        if not items:
+            return []
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        futures = [loop.create_future() for _ in items]
+        for item, future in zip(items, futures):
+            key = self.key_fn(item) if self.key_fn else None
+            self._queues.setdefault(key, deque()).append((item, future, now))
+        self._wakeup.set()
+
+        return await asyncio.gather(*futures)
+
+    async def submit(self, item):
+        results = await self.submit_many([item])
+        return results[0]
+
+    @property
+    def queue_size(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    # =========================
+    # Dispatching
+    # =========================
+    def _drop_cancelled(self):
+        # Requests cut off by the timeout middleware leave cancelled futures behind
+        for key in list(self._queues):
+            queue = self._queues[key]
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[key]
+
+    def _pick_queue(self, now):
+        """Return (key, None) for a queue ready to dispatch, or (None, next_deadline)."""
+        oldest_key, oldest_time = None, None
+        for key, queue in self._queues.items():
+            if len(queue) >= self.max_batch_size:
+                return key, None
+            if oldest_time is None or queue[0][2] < oldest_time:
+                oldest_key, oldest_time = key, queue[0][2]
+
+        if oldest_time is None:
+            return None, None
+        deadline = oldest_time + self.max_wait
+        if deadline <= now:
+            return oldest_key, None
+        return None, deadline
+
+    async def _wait_for_items(self, timeout=None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            self._drop_cancelled()
+            if not self._queues:
+                await self._wait_for_items()
+                continue
+
+            # Wait for a free worker first, so batches keep filling while all workers are busy
+            await self._slots.acquire()
+
+            while True:
+                self._drop_cancelled()
+                key, deadline = self._pick_queue(loop.time())
+                if key is not None or deadline is None:
+                    break
+                await self._wait_for_items(deadline - loop.time())
+
+            queue = self._queues.get(key) if deadline is None and self._queues else None
+            batch = []
+            waits = []
+            now = loop.time()
+            while queue and len(batch) < self.max_batch_size:
+                item, future, enqueued_at = queue.popleft()
+                if not future.done():
+                    batch.append((item, future))
+                    waits.append(now - enqueued_at)
+
+            if not batch:
+                self._slots.release()
+                continue
+
+            if self.on_dispatch is not None:
+                self.on_dispatch(waits)
+            self.running_batches += 1
+            loop.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.running_batches -= 1
+            self._slots.release()
@@ -0,0 +1,49 @@
+import bisect
+import numpy as np
+
+# Upper bounds (in tokens) of the length buckets; the last one must be >= MAX_LENGTH
+DEFAULT_BUCKET_WIDTHS = (16, 32, 64, 128)
+
+
+def bucket_key(length: int, widths=DEFAULT_BUCKET_WIDTHS) -> int:
+    """Return the width of the smallest bucket that fits a sequence of `length` tokens."""
+    idx = bisect.bisect_left(widths, length)
+    return widths[min(idx, len(widths) - 1)]
+
+
+def pad_batch(sequences, pad_id=0, out=None):
+    """
+    Pad a list of (input_ids, token_type_ids) pairs to the longest sequence in the batch.
+    Rows given as int64 arrays are copied in with a single memcpy each.
+
+    Returns int64 (input_ids, attention_mask, token_type_ids) arrays of shape [batch, width].
+    If `out` is given, it must be a callable `out(batch, width)` returning those three arrays
+    (e.g. views into shared memory); they are filled in place instead of allocating.
+    """
+    width = max(len(ids) for ids, _ in sequences)
+    batch = len(sequences)
+
+    if out is None:
+        input_ids = np.empty((batch, width), dtype=np.int64)
+        attention_mask = np.empty((batch, width), dtype=np.int64)
+        token_type_ids = np.empty((batch, width), dtype=np.int64)
+    else:
+        input_ids, attention_mask, token_type_ids = out(batch, width)
+
+    input_ids.fill(pad_id)
+    attention_mask.fill(0)
+    token_type_ids.fill(0)
+
+    for row, (ids, type_ids) in enumerate(sequences):
+        n = len(ids)
+        input_ids[row, :n] = ids
+        attention_mask[row, :n] = 1
+        token_type_ids[row, :n] = type_ids
+
+    return input_ids, attention_mask, token_type_ids
+
+
+def padding_efficiency(lengths, padded_widths) -> float:
+    """Share of computed token positions that carry real tokens (1.0 means no padding waste)."""
+    total = sum(padded_widths)
+    return round(sum(lengths) / total, 4) if total > 0 else 1.0
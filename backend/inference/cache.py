@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Bumped whenever the shape of cached values changes, so old disk entries are never read back
+_VALUE_SCHEMA = 2
+
+# Rough per-entry bookkeeping cost of the OrderedDict node, on top of key and value sizes
+_ENTRY_OVERHEAD = 100
+
+
+def _sizeof(value) -> int:
+    # Values are small nested tuples/lists of numbers, e.g. (predicted_class, [probabilities])
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def normalize_text(text: str) -> str:
+    # Only normalizations that the tokenizer would not see anyway
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class _DiskTier:
+    """SQLite-backed tier that keeps predictions across restarts."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM predictions WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in items],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PredictionCache:
+    """
+    Content-addressed prediction cache.
+
+    Keys are a hash of the normalized text plus the model version, so a new
+    model never serves stale predictions. The memory tier is an LRU bounded by
+    `max_bytes`; the optional disk tier (`disk_path`) survives restarts.
+    Identical texts that are already being inferred are coalesced: later
+    callers wait for the in-flight result instead of running the model again.
+    """
+
+    def __init__(self, model_version="", max_bytes=64 * 1024 * 1024, disk_path=None):
+        self.model_version = model_version
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self._disk = _DiskTier(disk_path) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> str:
+        payload = f"{_VALUE_SCHEMA}\0{self.model_version}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # =========================
+    # Memory tier
+    # =========================
+    def _get(self, key):
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        self._entries[key] = value
+        self._bytes += sys.getsizeof(key) + _sizeof(value) + _ENTRY_OVERHEAD
+
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._bytes -= sys.getsizeof(old_key) + _sizeof(old_value) + _ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def _resolve(self, key, future, value):
+        self._inflight.pop(key, None)
+        self._put(key, value)
+        future.set_result(value)
+
+    # =========================
+    # Lookup with single-flight
+    # =========================
+    async def get_or_compute(self, texts: list[str], compute) -> list:
+        """
+        Return one value per text, calling `await compute(missing_texts)` only for
+        texts that are neither cached nor already being computed by another request.
+        """
+        loop = asyncio.get_running_loop()
+        keys = [self.key(t) for t in texts]
+
+        values = {}
+        waiting = {}
+        pending = {}   # key -> text, unique misses owned by this call
+
+        for key, text in zip(keys, texts):
+            if key in values or key in waiting or key in pending:
+                continue
+
+            value = self._get(key)
+            if value is not None:
+                self.hits += 1
+                values[key] = value
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                pending[key] = text
+
+        # Claim the misses before any await, so concurrent callers coalesce onto them
+        owned = {key: loop.create_future() for key in pending}
+        self._inflight.update(owned)
+
+        try:
+            if pending and self._disk is not None:
+                found = await loop.run_in_executor(None, self._disk.get_many, list(pending))
+                for key, value in found.items():
+                    self.disk_hits += 1
+                    self._resolve(key, owned[key], value)
+                    values[key] = value
+                    del pending[key]
+
+            if pending:
+                self.misses += len(pending)
+                computed = await compute(list(pending.values()))
+
+                for key, value in zip(pending, computed):
+                    self._resolve(key, owned[key], value)
+                    values[key] = value
+
+                if self._disk is not None:
+                    await loop.run_in_executor(
+                        None, self._disk.put_many, [(key, values[key]) for key in pending]
+                    )
+        except BaseException as e:
+            for key, future in owned.items():
+                if not future.done():
+                    self._inflight.pop(key, None)
+                    future.set_exception(RuntimeError(f"Coalesced inference failed: {e!r}"))
+                    # Avoid "exception was never retrieved" when nobody else was waiting
+                    future.exception()
+            raise
+
+        for key, future in waiting.items():
+            values[key] = await asyncio.shield(future)
+
+        return [values[key] for key in keys]
+
+    # =========================
+    # Stats
+    # =========================
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_enabled": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._disk is not None:
+            self._disk.close()
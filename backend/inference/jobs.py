@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from inference.admission import AdmissionRejected
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobStore:
+    """
+    SQLite store for bulk jobs: one row per job, one row per text.
+
+    Results are written next to their texts chunk by chunk, so a job's
+    progress is checkpointed as it runs and survives a restart.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_texts (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                predicted_class INTEGER,
+                probabilities TEXT,
+                PRIMARY KEY (job_id, idx)
+            );
+        """)
+        self._conn.commit()
+
+    def create(self, texts: list[str]) -> dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, total, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, len(texts), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_texts (job_id, idx, text) VALUES (?, ?, ?)",
+                ((job_id, i, text) for i, text in enumerate(texts)),
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def get(self, job_id) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, total, processed, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("job_id", "status", "total", "processed", "error", "created_at", "updated_at"), row))
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else 1.0
+        return job
+
+    def next_job(self) -> str | None:
+        # Oldest unfinished job first
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def pending(self, job_id, limit) -> list[tuple[int, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT idx, text FROM job_texts WHERE job_id = ? AND predicted_class IS NULL ORDER BY idx LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+
+    def save_results(self, job_id, rows) -> bool:
+        """Store (idx, predicted_class, probabilities) rows; False if the job was deleted meanwhile."""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET processed = processed + ?, updated_at = ? WHERE id = ?",
+                (len(rows), time.time(), job_id),
+            ).rowcount
+            if updated:
+                self._conn.executemany(
+                    "UPDATE job_texts SET predicted_class = ?, probabilities = ? WHERE job_id = ? AND idx = ?",
+                    [(pred, json.dumps(probs), job_id, idx) for idx, pred, probs in rows],
+                )
+            self._conn.commit()
+        return bool(updated)
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def results(self, job_id, offset=0, limit=1000) -> list[tuple[int, int, list[float]]]:
+        # Scored rows with idx >= offset; rows still being scored are skipped, not waited for
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, predicted_class, probabilities FROM job_texts "
+                "WHERE job_id = ? AND idx >= ? AND predicted_class IS NOT NULL ORDER BY idx LIMIT ?",
+                (job_id, offset, limit),
+            ).fetchall()
+        return [(idx, pred, json.loads(probs)) for idx, pred, probs in rows]
+
+    def delete(self, job_id) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self._conn.execute("DELETE FROM job_texts WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+        return bool(deleted)
+
+    def requeue_running(self) -> int:
+        # Jobs interrupted by a restart continue from their last checkpoint
+        with self._lock:
+            count = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+            self._conn.commit()
+        return count
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: dict(rows).get(status, 0) for status in JOB_STATUSES}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobRunner:
+    """
+    Works through stored jobs one at a time, oldest first.
+
+    Each round takes up to `max_inflight_chunks` chunks of unscored texts,
+    admits every chunk on the `lane` admission lane (bulk by default, so
+    interactive /predict traffic always goes first), scores them through
+    `score` and checkpoints the results. Shed chunks wait out Retry-After
+    and try again instead of failing the job.
+    """
+
+    def __init__(self, store, score, admission, chunk_size=64, max_inflight_chunks=4, lane="bulk"):
+        self.store = store
+        self.score = score   # async (texts) -> [(predicted_class, probabilities)]
+        self.admission = admission
+        self.chunk_size = chunk_size
+        self.max_inflight_chunks = max_inflight_chunks
+        self.lane = lane
+
+        self._task = None
+        self._wakeup = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def notify(self):
+        # New job submitted; call from the event loop thread (asyncio.Event is not thread-safe)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        resumed = await asyncio.to_thread(self.store.requeue_running)
+        if resumed:
+            print(f"🔁 Resuming {resumed} bulk job(s) from their last checkpoint")
+
+        while True:
+            self._wakeup.clear()
+            job_id = await asyncio.to_thread(self.store.next_job)
+            if job_id is None:
+                await self._wakeup.wait()
+                continue
+            await self._process(job_id)
+
+    async def _process(self, job_id):
+        await asyncio.to_thread(self.store.set_status, job_id, "running")
+        try:
+            while True:
+                rows = await asyncio.to_thread(self.store.pending, job_id, self.chunk_size * self.max_inflight_chunks)
+                if not rows:
+                    break
+
+                chunks = [rows[i:i + self.chunk_size] for i in range(0, len(rows), self.chunk_size)]
+                scored = await asyncio.gather(*(self._score_chunk(chunk) for chunk in chunks))
+                saved = await asyncio.to_thread(
+                    self.store.save_results, job_id, [row for chunk in scored for row in chunk]
+                )
+                if not saved:
+                    return   # deleted while running
+
+            await asyncio.to_thread(self.store.set_status, job_id, "done")
+        except asyncio.CancelledError:
+            raise   # shutdown: stays 'running' and is requeued on the next start
+        except Exception as e:
+            print(f"❌ Bulk job {job_id} failed: {e!r}")
+            await asyncio.to_thread(self.store.set_status, job_id, "failed", repr(e))
+
+    async def _score_chunk(self, rows):
+        texts = [text for _, text in rows]
+        while True:
+            try:
+                ticket = await self.admission.acquire(len(texts), self.lane)
+                break
+            except AdmissionRejected as e:
+                await asyncio.sleep(e.retry_after)
+
+        try:
+            outputs = await self.score(texts)
+        finally:
+            self.admission.release(ticket)
+        return [(idx, int(pred), probs) for (idx, _), (pred, probs) in zip(rows, outputs)]
@@ -0,0 +1,339 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from inference.bucketing import pad_batch
+from inference.session_config import ExecutionConfig, SessionRunner
+from inference.session_loader import create_session, warm_up
+
+_INT64 = np.dtype(np.int64).itemsize
+_FLOAT32 = np.dtype(np.float32).itemsize
+
+HEALTHY_UPTIME = 60.0  # seconds a worker must stay up before its restart backoff starts over
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class _SlotLayout:
+    """Byte offsets of one ring-buffer slot: three int64 [B, L] inputs, then float32 [B, C] logits."""
+
+    def __init__(self, max_batch_size, max_length, num_labels):
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.num_labels = num_labels
+
+        tensor_bytes = max_batch_size * max_length * _INT64
+        self.input_offsets = (0, tensor_bytes, 2 * tensor_bytes)
+        self.logits_offset = 3 * tensor_bytes
+        self.slot_bytes = self.logits_offset + max_batch_size * num_labels * _FLOAT32
+
+    def inputs(self, buf, slot, batch, width):
+        base = slot * self.slot_bytes
+        return tuple(
+            np.ndarray((batch, width), dtype=np.int64, buffer=buf, offset=base + off)
+            for off in self.input_offsets
+        )
+
+    def logits(self, buf, slot, batch):
+        base = slot * self.slot_bytes
+        return np.ndarray((batch, self.num_labels), dtype=np.float32, buffer=buf, offset=base + self.logits_offset)
+
+
+# =========================
+# Worker process
+# =========================
+def _worker_main(worker_id, model_path, provider, shm_name, layout, cores, graph_cache_dir, warmup_widths,
+                 execution_config, conn):
+    # Pin before the session exists, so ORT's intra-op threads inherit the core set
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    # One batch at a time per process: "auto" intra-op threads = the worker's own cores
+    options = execution_config.session_options(cores=len(cores) or None, concurrency=1)
+    session, _ = create_session(model_path, provider, graph_cache_dir, options,
+                                execution_config.provider_options(provider))
+    runner = SessionRunner(session, io_binding=execution_config.io_binding)
+
+    # Warm before reporting ready, so restarted workers don't serve cold batches either
+    warm_up(session, warmup_widths, sorted({1, layout.max_batch_size}))
+
+    # Spawned children share the API process' resource tracker, which unlinks the segment on close
+    shm = SharedMemory(name=shm_name)
+
+    conn.send(("ready", worker_id))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+
+        slot, batch, width = msg
+        try:
+            input_ids, attention_mask, token_type_ids = layout.inputs(shm.buf, slot, batch, width)
+            # With IOBinding, logits are written straight into the slot
+            runner.run({
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": token_type_ids,
+            }, out=layout.logits(shm.buf, slot, batch))
+            conn.send((slot, None))
+        except Exception as e:
+            conn.send((slot, repr(e)))
+
+    shm.close()
+
+
+# =========================
+# API-process side
+# =========================
+class _Pending:
+    __slots__ = ("event", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+
+class _Worker:
+    def __init__(self, engine, worker_id, cores):
+        self.engine = engine
+        self.id = worker_id
+        self.cores = cores
+        self.shm = SharedMemory(create=True, size=engine.slots_per_worker * engine.layout.slot_bytes)
+
+        self.process = None
+        self.conn = None
+        self.ready = threading.Event()
+        self.send_lock = threading.Lock()
+        self.pending = {}   # slot -> _Pending
+        self.restarts = 0
+        self.failures = 0   # consecutive crashes, drives the restart backoff
+        self.started_at = None
+        self.supervisor = None
+
+    def spawn(self):
+        parent_conn, child_conn = self.engine.ctx.Pipe()
+        self.process = self.engine.ctx.Process(
+            target=_worker_main,
+            args=(self.id, self.engine.model_path, self.engine.provider, self.shm.name,
+                  self.engine.layout, self.cores, self.engine.graph_cache_dir,
+                  self.engine.warmup_widths, self.engine.execution_config, child_conn),
+            name=f"inference-worker-{self.id}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+        if not parent_conn.poll(self.engine.start_timeout):
+            self.process.kill()
+            raise RuntimeError(f"Inference worker {self.id} did not start in {self.engine.start_timeout}s")
+        parent_conn.recv()
+        self.started_at = time.monotonic()
+        self.ready.set()
+
+    def submit(self, slot, batch, width):
+        pending = _Pending()
+        if not self.ready.wait(self.engine.start_timeout):
+            raise WorkerCrashed(f"Inference worker {self.id} is not available")
+
+        with self.send_lock:
+            self.pending[slot] = pending
+            self.conn.send((slot, batch, width))
+        return pending
+
+    def recycle(self, reason):
+        # Hung, not dead: kill it so the supervisor fails its other batches and restarts it
+        print(f"⚠️ {reason}, recycling inference worker {self.id}")
+        self.ready.clear()
+        self.process.kill()
+
+    def fail_pending(self, reason):
+        for pending in self.pending.values():
+            pending.error = WorkerCrashed(reason)
+            pending.event.set()
+        self.pending.clear()
+
+    def supervise(self):
+        # Routes results back to waiting threads and restarts the worker when it dies
+        while not self.engine.closed:
+            try:
+                has_msg = self.conn.poll(0.2)
+                if has_msg:
+                    slot, error = self.conn.recv()
+                    pending = self.pending.pop(slot, None)
+                    if pending is not None:
+                        pending.error = RuntimeError(error) if error else None
+                        pending.event.set()
+                    continue
+            except (EOFError, OSError):
+                pass
+
+            if self.process.is_alive():
+                continue
+
+            self.ready.clear()
+            with self.send_lock:
+                self.fail_pending(f"Inference worker {self.id} exited with code {self.process.exitcode}")
+
+            if self.engine.closed:
+                break
+
+            self.restarts += 1
+            if self.started_at is not None and time.monotonic() - self.started_at >= HEALTHY_UPTIME:
+                self.failures = 0   # it ran fine for a while: restart right away
+            self.failures += 1
+            print(f"⚠️ Inference worker {self.id} died, restarting (restart #{self.restarts})")
+            time.sleep(min(2 ** (self.failures - 1), 30))
+            try:
+                self.spawn()
+            except Exception as e:
+                print(f"❌ Restarting inference worker {self.id} failed: {e}")
+
+
+class ProcessEngine:
+    """
+    Sharded inference across N worker processes, each pinned to its own core set.
+
+    Every worker owns an ONNX Runtime session and a shared-memory ring of
+    `slots_per_worker` slots. The API process pads token tensors straight into
+    a free slot and only sends (slot, batch, width) over a pipe; logits come back
+    through the same slot. Workers are supervised and restarted if they crash
+    (or are killed after not answering within `request_timeout`), and only
+    take traffic after warming up at every width in `warmup_widths`.
+    """
+
+    def __init__(self, model_path, provider="CPUExecutionProvider", num_workers=None, slots_per_worker=2,
+                 max_batch_size=16, max_length=128, num_labels=3, start_timeout=300.0,
+                 graph_cache_dir=None, warmup_widths=(), execution_config=None, request_timeout=None):
+        self.model_path = model_path
+        self.provider = provider
+        self.execution_config = execution_config or ExecutionConfig()
+        self.graph_cache_dir = graph_cache_dir
+        self.warmup_widths = tuple(warmup_widths)
+        self.num_workers = num_workers or max(1, len(self._available_cores()) // 4)
+        self.slots_per_worker = slots_per_worker
+        self.layout = _SlotLayout(max_batch_size, max_length, num_labels)
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+
+        self.ctx = multiprocessing.get_context("spawn")
+        self.closed = False
+        self.workers = []
+        self._free_slots = queue.Queue()
+
+    @staticmethod
+    def _available_cores():
+        if hasattr(os, "sched_getaffinity"):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    def _core_sets(self):
+        cores = self._available_cores()
+        if len(cores) < self.num_workers:
+            return [[] for _ in range(self.num_workers)]   # fewer cores than workers: don't pin
+        per_worker = len(cores) // self.num_workers
+        return [cores[i * per_worker:(i + 1) * per_worker] for i in range(self.num_workers)]
+
+    @property
+    def capacity(self) -> int:
+        return self.num_workers * self.slots_per_worker
+
+    def start(self):
+        for worker_id, cores in enumerate(self._core_sets()):
+            worker = _Worker(self, worker_id, cores)
+            self.workers.append(worker)
+            worker.spawn()
+            worker.supervisor = threading.Thread(
+                target=worker.supervise, name=f"inference-supervisor-{worker_id}", daemon=True
+            )
+            worker.supervisor.start()
+
+        # Interleave slots so consecutive batches go to different workers
+        for slot in range(self.slots_per_worker):
+            for worker in self.workers:
+                self._free_slots.put((worker, slot))
+
+        print(f"✅ Started {self.num_workers} inference workers on:",
+              [w.cores or "unpinned" for w in self.workers])
+
+    def run(self, sequences, pad_id=0, retries=1) -> np.ndarray:
+        """Run one padded batch on a worker and return a private copy of its logits."""
+        if len(sequences) > self.layout.max_batch_size:
+            raise ValueError(f"Batch of {len(sequences)} exceeds engine max_batch_size {self.layout.max_batch_size}")
+
+        worker, slot = self._free_slots.get()
+        try:
+            buf = worker.shm.buf
+            pad_batch(
+                sequences,
+                pad_id=pad_id,
+                out=lambda batch, width: self.layout.inputs(buf, slot, batch, width),
+            )
+            width = max(len(ids) for ids, _ in sequences)
+
+            pending = worker.submit(slot, len(sequences), width)
+            if not pending.event.wait(self.request_timeout):
+                with worker.send_lock:
+                    worker.pending.pop(slot, None)
+                reason = f"Inference worker {worker.id} did not answer in {self.request_timeout}s"
+                worker.recycle(reason)
+                raise WorkerCrashed(reason)
+            if pending.error is not None:
+                raise pending.error
+
+            return self.layout.logits(buf, slot, len(sequences)).copy()
+
+        except WorkerCrashed:
+            if retries <= 0:
+                raise
+        finally:
+            self._free_slots.put((worker, slot))
+
+        # The worker died mid-batch: retry once on whichever slot frees up next
+        return self.run(sequences, pad_id=pad_id, retries=retries - 1)
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {
+                    "id": w.id,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": bool(w.process and w.process.is_alive()),
+                    "cores": w.cores,
+                    "restarts": w.restarts,
+                }
+                for w in self.workers
+            ],
+            "free_slots": self._free_slots.qsize(),
+            "capacity": self.capacity,
+        }
+
+    def close(self):
+        self.closed = True
+        for worker in self.workers:
+            if worker.conn is None:
+                continue   # start() failed before this worker was spawned
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            worker.fail_pending("Inference engine closed")
+            worker.shm.close()
+            worker.shm.unlink()
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+import numpy as np
+import onnxruntime as ort
+
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+class ExecutionConfig:
+    """
+    ONNX Runtime threading / memory settings for one serving setup.
+
+    `intra_op_num_threads=0` means "auto": the cores a session may use divided by
+    the number of session.run calls that share them, so concurrent batches don't
+    each fan out over every core. Written by scripts/tune_session.py, loaded
+    from ORT_CONFIG_PATH.
+    """
+
+    FIELDS = {
+        "intra_op_num_threads": 0,
+        "inter_op_num_threads": 1,
+        "execution_mode": "sequential",     # sequential | parallel
+        "enable_cpu_mem_arena": True,
+        "enable_mem_pattern": True,
+        "allow_spinning": True,             # intra-op threads busy-wait between ops
+        "io_binding": False,                # bind inputs/outputs to preallocated buffers
+        "arena_extend_strategy": None,      # CUDA only: kNextPowerOfTwo | kSameAsRequested
+    }
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown execution config field(s): {', '.join(sorted(unknown))}")
+        if settings.get("execution_mode", "sequential") not in _EXECUTION_MODES:
+            raise ValueError(f"execution_mode must be one of {', '.join(_EXECUTION_MODES)}")
+        for name, default in self.FIELDS.items():
+            setattr(self, name, settings.get(name, default))
+
+    @classmethod
+    def load(cls, path=None) -> "ExecutionConfig":
+        # Accepts a bare config or the tuner's report ({"config": {...}, ...})
+        if not path:
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(**data.get("config", data))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def replace(self, **changes) -> "ExecutionConfig":
+        return ExecutionConfig(**{**self.to_dict(), **changes})
+
+    def intra_threads(self, cores, concurrency=1) -> int:
+        if self.intra_op_num_threads:
+            return self.intra_op_num_threads
+        return max(1, cores // max(1, concurrency))
+
+    def session_options(self, cores=None, concurrency=1) -> ort.SessionOptions:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_threads(cores or os.cpu_count() or 1, concurrency)
+        options.inter_op_num_threads = self.inter_op_num_threads
+        options.execution_mode = _EXECUTION_MODES[self.execution_mode]
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        options.enable_mem_pattern = self.enable_mem_pattern
+        options.add_session_config_entry("session.intra_op.allow_spinning", "1" if self.allow_spinning else "0")
+        return options
+
+    def provider_options(self, provider) -> list[dict]:
+        if provider == "CUDAExecutionProvider" and self.arena_extend_strategy:
+            return [{"arena_extend_strategy": self.arena_extend_strategy}]
+        return [{}]
+
+    def __repr__(self):
+        return f"ExecutionConfig({self.to_dict()})"
+
+
+class SessionRunner:
+    """
+    session.run for a single-output classifier, optionally through IOBinding.
+
+    With IOBinding each calling thread keeps its own binding and one
+    preallocated logits buffer per batch size, so steady-state batches don't
+    allocate outputs. The returned array is that reused buffer: consume it
+    before the same thread runs the next batch. `out` binds the output to a
+    caller-owned array instead (e.g. a shared-memory slot).
+    """
+
+    def __init__(self, session, io_binding=False):
+        self.session = session
+        self.io_binding = io_binding
+        self.output_name = session.get_outputs()[0].name
+        num_labels = session.get_outputs()[0].shape[-1]
+        self.num_labels = num_labels if isinstance(num_labels, int) else None
+        self._local = threading.local()
+
+    def run(self, feeds, out=None) -> np.ndarray:
+        if not self.io_binding:
+            logits = self.session.run([self.output_name], feeds)[0]
+            if out is not None:
+                out[:] = logits
+                return out
+            return logits
+
+        batch = next(iter(feeds.values())).shape[0]
+        if out is None:
+            out = self._buffer(batch, feeds)
+
+        binding = getattr(self._local, "binding", None)
+        if binding is None:
+            binding = self._local.binding = self.session.io_binding()
+        binding.clear_binding_inputs()
+        binding.clear_binding_outputs()
+        for name, array in feeds.items():
+            binding.bind_cpu_input(name, np.ascontiguousarray(array))
+        binding.bind_output(self.output_name, "cpu", 0, np.float32, list(out.shape), out.ctypes.data)
+
+        self.session.run_with_iobinding(binding)
+        return out
+
+    def _buffer(self, batch, feeds) -> np.ndarray:
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        if batch not in buffers:
+            if self.num_labels is None:
+                # Symbolic label dimension: learn it from one plain run
+                self.num_labels = self.session.run([self.output_name], feeds)[0].shape[-1]
+            buffers[batch] = np.empty((batch, self.num_labels), dtype=np.float32)
+        return buffers[batch]
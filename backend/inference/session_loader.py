@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import platform
+
+import numpy as np
+import onnxruntime as ort
+
+
+# =========================
+# Optimized-graph cache
+# =========================
+def model_digest(model_path, cache_dir) -> str:
+    """SHA-256 of the model file, memoized in `cache_dir` by (size, mtime) so boots don't rehash hundreds of MB."""
+    stat = os.stat(model_path)
+    path_id = hashlib.sha1(os.path.abspath(model_path).encode("utf-8")).hexdigest()[:16]
+    memo_path = os.path.join(cache_dir, f"digest-{path_id}.json")
+
+    try:
+        with open(memo_path, encoding="utf-8") as f:
+            memo = json.load(f)
+        if memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+            return memo["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    tmp_path = f"{memo_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}, f)
+    os.replace(tmp_path, memo_path)
+    return digest
+
+
+def optimized_model_path(model_path, provider, cache_dir) -> str:
+    # Optimized graphs can contain provider/CPU-specific kernels, so they are only reused on an identical setup
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{model_digest(model_path, cache_dir)[:16]}-ort{ort.__version__}-{provider}-{platform.machine()}"
+    return os.path.join(cache_dir, f"{stem}-{key}.onnx")
+
+
+def create_session(model_path, provider, cache_dir=None, options=None,
+                   provider_options=None) -> tuple[ort.InferenceSession, str]:
+    """
+    Build an InferenceSession, reusing a previously optimized graph when one exists.
+
+    The first boot runs full graph optimization and saves the result to
+    `cache_dir`; later boots load that file with optimization disabled.
+    Returns (session, graph_cache) where graph_cache is "hit", "miss" or "disabled".
+    """
+    options = options or ort.SessionOptions()
+    providers = {"providers": [provider], "provider_options": provider_options}
+    if not cache_dir:
+        return ort.InferenceSession(model_path, options, **providers), "disabled"
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cached_path = optimized_model_path(model_path, provider, cache_dir)
+    except OSError as e:
+        print(f"⚠️ Graph cache unavailable ({e}), optimizing in memory")
+        return ort.InferenceSession(model_path, options, **providers), "disabled"
+
+    if os.path.exists(cached_path):
+        level = options.graph_optimization_level
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached_path, options, **providers), "hit"
+        except Exception as e:
+            print(f"⚠️ Cached graph {cached_path} is unusable ({e}), rebuilding")
+            options.graph_optimization_level = level
+            try:
+                os.remove(cached_path)
+            except OSError:
+                pass
+
+    # Worker processes may optimize at the same time on a cold cache: each writes its own file, last rename wins
+    tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.optimized_model_filepath = tmp_path
+    session = ort.InferenceSession(model_path, options, **providers)
+    try:
+        os.replace(tmp_path, cached_path)
+    except OSError as e:
+        print(f"⚠️ Could not save optimized graph ({e})")
+    return session, "miss"
+
+
+# =========================
+# Warm-up
+# =========================
+def warm_up(session, widths, batch_sizes) -> int:
+    """
+    Run dummy batches at every padded width, so allocator arenas and kernels
+    are set up before the first real request. Returns the number of runs.
+    """
+    names = [i.name for i in session.get_inputs()]
+    runs = 0
+    for width in widths:
+        for batch in batch_sizes:
+            feeds = {
+                name: (np.ones if name == "attention_mask" else np.zeros)((batch, width), dtype=np.int64)
+                for name in names
+            }
+            session.run(None, feeds)
+            runs += 1
+    return runs
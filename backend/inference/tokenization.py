@@ -0,0 +1,113 @@
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from tokenizers import Tokenizer
+
+# Set in each tokenizer process by _init_worker
+_worker_tokenizer = None
+
+
+def _build_backend(tokenizer_json: str, max_length: int) -> Tokenizer:
+    backend = Tokenizer.from_str(tokenizer_json)
+    backend.no_padding()
+    backend.enable_truncation(max_length=max_length)
+    return backend
+
+
+def _to_arrays(encodings):
+    return [
+        (np.asarray(e.ids, dtype=np.int64), np.asarray(e.type_ids, dtype=np.int64))
+        for e in encodings
+    ]
+
+
+def _init_worker(tokenizer_json: str, max_length: int):
+    global _worker_tokenizer
+    _worker_tokenizer = _build_backend(tokenizer_json, max_length)
+
+
+def _encode_in_worker(texts: list[str]):
+    return _to_arrays(_worker_tokenizer.encode_batch(texts))
+
+
+class TokenizationStage:
+    """
+    Request-level tokenization.
+
+    A whole request is encoded with one call to the Rust `tokenizers` backend
+    (`encode_batch` releases the GIL and fans out over its own thread pool),
+    or, with `num_processes > 0`, split across a spawned process pool.
+    Token IDs of recently seen texts are kept in a bounded LRU, and every
+    sequence is returned as ready-to-pad int64 arrays: (input_ids, token_type_ids).
+    """
+
+    def __init__(self, tokenizer, max_length=128, cache_size=50_000, num_processes=0, chunk_size=256):
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size
+
+        tokenizer_json = tokenizer.backend_tokenizer.to_str()
+        # Own copy of the Rust tokenizer, so truncation settings don't touch the HF wrapper
+        self._backend = _build_backend(tokenizer_json, max_length)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._pool = None
+        if num_processes > 0:
+            # "spawn": forking after the Rust thread pool has started can deadlock
+            self._pool = ProcessPoolExecutor(
+                max_workers=num_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(tokenizer_json, max_length),
+            )
+
+        self.hits = 0
+        self.misses = 0
+
+    def _encode_uncached(self, texts: list[str]):
+        if self._pool is None or len(texts) <= self.chunk_size:
+            return _to_arrays(self._backend.encode_batch(texts))
+
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        return [seq for part in self._pool.map(_encode_in_worker, chunks) for seq in part]
+
+    def encode(self, texts: list[str]):
+        sequences = [None] * len(texts)
+        missing = {}   # text -> positions
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is not None:
+                    self._cache.move_to_end(text)
+                    sequences[i] = cached
+                    self.hits += 1
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            self.misses += len(missing)
+            encoded = self._encode_uncached(list(missing))
+
+            with self._lock:
+                for (text, positions), seq in zip(missing.items(), encoded):
+                    for i in positions:
+                        sequences[i] = seq
+                    self._cache[text] = seq
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return sequences
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
@@ -0,0 +1,18 @@
+# ONNX files produced by scripts/optimize_model.py, selected with MODEL_VARIANT
+MODEL_VARIANTS = {
+    "fp32": "model.onnx",         # plain export of the merged LoRA BERT
+    "fused": "model.fused.onnx",  # transformer-fused graph (attention, layernorm, gelu)
+    "int8": "model.int8.onnx",    # fused + dynamic INT8 weight quantization, best on CPU
+    "fp16": "model.fp16.onnx",    # fused + FP16 weights, only worth it on CUDA
+}
+
+DEFAULT_VARIANT = "fp32"
+
+
+def variant_filename(variant: str) -> str:
+    try:
+        return MODEL_VARIANTS[variant]
+    except KeyError:
+        raise ValueError(
+            f"Unknown model variant '{variant}' (expected one of: {', '.join(MODEL_VARIANTS)})"
+        ) from None
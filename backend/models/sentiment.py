@@ -6,7 +6,12 @@ class TextsRequest(BaseModel):
 class PredictionResult(BaseModel):
     text: str
     predicted_class: int
+    # only present with ?probabilities=true
+    probabilities: list[float] | None = None
 
 class PredictionResponse(BaseModel):
     batch_size: int
-    results: list[PredictionResult]
\ No newline at end of file
+    results: list[PredictionResult]
+    # real tokens / padded token positions computed for this request (1.0 = no padding waste);
+    # None when every prediction was served from the cache
+    padding_efficiency: float | None = None
\ No newline at end of file
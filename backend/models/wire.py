@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; JSON stays available without it
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    return bool(accept) and MSGPACK_MEDIA_TYPE in accept
+
+
+def pack_predictions(preds, probabilities=None) -> dict:
+    """
+    Compact representation of a batch: class IDs as a packed uint8 array,
+    optional probabilities as a packed float16 [batch, num_labels] array.
+    """
+    payload = {
+        "batch_size": len(preds),
+        "predicted_class": np.asarray(preds, dtype=np.uint8).tobytes(),
+    }
+    if probabilities is not None:
+        probs = np.asarray(probabilities, dtype=np.float16)
+        payload["num_labels"] = probs.shape[1] if probs.ndim == 2 else 0
+        payload["probabilities"] = probs.tobytes()
+    return payload
+
+
+def encode_msgpack(payload: dict) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def parse_text_upload(body: bytes, content_type: str | None) -> list[str]:
+    """
+    Texts from an uploaded file, by Content-Type:
+        text/csv              `text` column if the header has one, else the first column
+        application/x-ndjson  one JSON string or {"text": ...} object per line
+        anything else         plain text, one comment per line
+    Raises ValueError on undecodable input.
+    """
+    content = body.decode("utf-8-sig")
+    media_type = (content_type or "").split(";")[0].strip().lower()
+
+    if media_type == "text/csv":
+        rows = [row for row in csv.reader(io.StringIO(content)) if row]
+        if not rows:
+            return []
+        header = [name.strip().lower() for name in rows[0]]
+        if "text" in header:
+            col = header.index("text")
+            return [row[col] for row in rows[1:] if len(row) > col]
+        return [row[0] for row in rows]
+
+    if media_type in ("application/x-ndjson", "application/jsonl"):
+        texts = []
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            text = item.get("text") if isinstance(item, dict) else item
+            if not isinstance(text, str):
+                raise ValueError(f"Expected a string or {{\"text\": ...}} per line, got: {line[:80]}")
+            texts.append(text)
+        return texts
+
+    return [line for line in content.splitlines() if line.strip()]
@@ -0,0 +1,203 @@
+"""
+Build optimized ONNX variants of the merged LoRA BERT and check them against the FP32 export.
+
+Steps:
+    1. export    merged HF model -> model.onnx (skipped when --onnx-model is given)
+    2. fused     onnxruntime transformer optimizer -> model.fused.onnx
+    3. int8      dynamic INT8 quantization of the fused graph -> model.int8.onnx
+    4. fp16      FP16 conversion of the fused graph -> model.fp16.onnx (only with CUDA or --fp16)
+    5. parity    argmax agreement with FP32, accuracy on a held-out CSV, throughput per variant
+
+Usage (from the backend folder):
+    python -m scripts.optimize_model --merged-model lora_bert_sentiment --eval-csv heldout.csv
+    python -m scripts.optimize_model --onnx-model onnx_lora_bert/model.onnx --output-dir onnx_lora_bert
+
+The held-out CSV needs `text` and `labels` columns (0=negative, 1=neutral, 2=positive).
+Serve a variant with MODEL_DIR=<output-dir> MODEL_VARIANT=int8.
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+from benchmarks.corpus import synthetic_comments
+from inference.bucketing import bucket_key, pad_batch
+from inference.tokenization import TokenizationStage
+from inference.variants import MODEL_VARIANTS
+
+MAX_LENGTH = 128
+BATCH_LIMIT = 16
+NUM_HEADS = 12      # bert-base
+HIDDEN_SIZE = 768   # bert-base
+
+
+# =========================
+# Build variants
+# =========================
+def export_merged(merged_dir, output_dir):
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    ort_model = ORTModelForSequenceClassification.from_pretrained(merged_dir, export=True)
+    ort_model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(merged_dir).save_pretrained(output_dir)
+    return os.path.join(output_dir, MODEL_VARIANTS["fp32"])
+
+
+def build_fused(fp32_path, output_dir, use_gpu=False):
+    from onnxruntime.transformers.optimizer import optimize_model
+
+    # opt_level=1 keeps the graph portable across providers; fusions are done by the optimizer itself
+    fused = optimize_model(
+        fp32_path,
+        model_type="bert",
+        num_heads=NUM_HEADS,
+        hidden_size=HIDDEN_SIZE,
+        opt_level=1,
+        use_gpu=use_gpu,
+    )
+    path = os.path.join(output_dir, MODEL_VARIANTS["fused"])
+    fused.save_model_to_file(path)
+    return path, fused
+
+
+def build_int8(fused_path, output_dir):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = os.path.join(output_dir, MODEL_VARIANTS["int8"])
+    quantize_dynamic(fused_path, path, weight_type=QuantType.QInt8, per_channel=True)
+    return path
+
+
+def build_fp16(fused_model, output_dir):
+    # Keep int64 inputs / float32 logits so the API code does not change
+    fused_model.convert_float_to_float16(keep_io_types=True)
+    path = os.path.join(output_dir, MODEL_VARIANTS["fp16"])
+    fused_model.save_model_to_file(path)
+    return path
+
+
+# =========================
+# Parity and throughput
+# =========================
+def load_heldout(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r.get("text")]
+    return [r["text"] for r in rows], np.array([int(r["labels"]) for r in rows])
+
+
+def predict(session, stage, texts):
+    sequences = stage.encode(texts)
+    preds = np.empty(len(texts), dtype=np.int64)
+
+    buckets = {}
+    for i, seq in enumerate(sequences):
+        buckets.setdefault(bucket_key(len(seq[0])), []).append(i)
+
+    for indices in buckets.values():
+        for start in range(0, len(indices), BATCH_LIMIT):
+            idx = indices[start:start + BATCH_LIMIT]
+            input_ids, attention_mask, token_type_ids = pad_batch([sequences[i] for i in idx])
+            logits = session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": token_type_ids,
+            })[0]
+            preds[idx] = np.argmax(logits, axis=-1)
+    return preds
+
+
+def throughput(session, stage, texts, repeats=3):
+    predict(session, stage, texts[:BATCH_LIMIT])   # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(session, stage, texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def evaluate(paths, tokenizer, provider, eval_texts, eval_labels, bench_texts):
+    stage = TokenizationStage(tokenizer, max_length=MAX_LENGTH, cache_size=0)
+    sessions = {name: ort.InferenceSession(path, providers=[provider]) for name, path in paths.items()}
+
+    reference = predict(sessions["fp32"], stage, eval_texts) if eval_texts else None
+
+    report = {}
+    for name, session in sessions.items():
+        entry = {
+            "file": os.path.basename(paths[name]),
+            "size_mb": round(os.path.getsize(paths[name]) / 2**20, 1),
+            "texts_per_sec": round(throughput(session, stage, bench_texts), 1),
+        }
+        if eval_texts:
+            preds = predict(session, stage, eval_texts)
+            entry["argmax_agreement"] = round(float(np.mean(preds == reference)), 4)
+            entry["accuracy"] = round(float(np.mean(preds == eval_labels)), 4)
+        report[name] = entry
+        print(f"{name:<6} {entry}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--merged-model", help="HF folder of the merged LoRA BERT (model.merge_and_unload())")
+    source.add_argument("--onnx-model", help="Existing FP32 model.onnx; tokenizer files must sit next to it")
+    parser.add_argument("--output-dir", default="onnx_lora_bert")
+    parser.add_argument("--eval-csv", help="Held-out set with text,labels columns")
+    parser.add_argument("--bench-samples", type=int, default=1024)
+    parser.add_argument("--fp16", action="store_true", help="Build the FP16 variant even without CUDA")
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="Fail if a variant agrees less with FP32")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    cuda = "CUDAExecutionProvider" in ort.get_available_providers()
+    provider = "CUDAExecutionProvider" if cuda else "CPUExecutionProvider"
+
+    if args.merged_model:
+        fp32_path = export_merged(args.merged_model, args.output_dir)
+        tokenizer_dir = args.output_dir
+    else:
+        fp32_path = os.path.join(args.output_dir, MODEL_VARIANTS["fp32"])
+        if os.path.abspath(args.onnx_model) != os.path.abspath(fp32_path):
+            shutil.copyfile(args.onnx_model, fp32_path)
+        tokenizer_dir = os.path.dirname(os.path.abspath(args.onnx_model))
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+    if os.path.abspath(tokenizer_dir) != os.path.abspath(args.output_dir):
+        tokenizer.save_pretrained(args.output_dir)   # MODEL_DIR=<output-dir> loads the tokenizer from there too
+
+    paths = {"fp32": fp32_path}
+    paths["fused"], fused_model = build_fused(fp32_path, args.output_dir, use_gpu=cuda)
+    paths["int8"] = build_int8(paths["fused"], args.output_dir)
+    if cuda or args.fp16:
+        paths["fp16"] = build_fp16(fused_model, args.output_dir)
+
+    eval_texts, eval_labels = load_heldout(args.eval_csv) if args.eval_csv else ([], None)
+    report = evaluate(paths, tokenizer, provider, eval_texts, eval_labels, synthetic_comments(args.bench_samples))
+
+    report_path = os.path.join(args.output_dir, "variants_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "provider": provider,
+            "onnxruntime": ort.__version__,
+            "eval_samples": len(eval_texts),
+            "variants": report,
+        }, f, indent=2)
+    print(f"✅ Report written to {report_path}")
+
+    failing = [
+        name for name, entry in report.items()
+        if entry.get("argmax_agreement", 1.0) < args.min_agreement
+    ]
+    if failing:
+        raise SystemExit(f"❌ Variants below {args.min_agreement} argmax agreement: {', '.join(failing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Tune ONNX Runtime threading / memory settings on this host and write the best config as JSON.
+
+The search is coordinate descent over the ExecutionConfig fields (intra/inter-op threads,
+execution mode, CPU memory arena, memory pattern, thread spinning, IOBinding): each field is
+tried in turn with the others fixed at the best values so far. Every candidate runs the
+same length-bucketed batches of synthetic comments from `--concurrency` threads at once,
+which is how the API calls session.run (INFERENCE_CONCURRENCY in thread mode).
+
+Usage (from the backend folder):
+    python -m scripts.tune_session --model-dir onnx_lora_bert --concurrency 4
+    python -m scripts.tune_session --stand-in --objective p95 --output ort_config.json
+
+Serve with the result:
+    ORT_CONFIG_PATH=ort_config.json uvicorn app:app --host 0.0.0.0 --port ${PORT}
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+
+from benchmarks.corpus import synthetic_comments
+from inference.bucketing import bucket_key, pad_batch
+from inference.session_config import ExecutionConfig, SessionRunner
+from inference.session_loader import create_session, warm_up
+from inference.tokenization import TokenizationStage
+from inference.variants import variant_filename
+
+MAX_LENGTH = 128
+BATCH_LIMIT = 16
+WARMUP_WIDTHS = (16, 32, 64, 128)
+
+
+def make_batches(tokenizer, samples, batch_size):
+    # Same grouping as the API: one batch per length bucket, padded to its longest member
+    stage = TokenizationStage(tokenizer, max_length=MAX_LENGTH, cache_size=0)
+    sequences = stage.encode(synthetic_comments(samples, seed=1))
+
+    buckets = {}
+    for seq in sequences:
+        buckets.setdefault(bucket_key(len(seq[0])), []).append(seq)
+
+    batches = []
+    for group in buckets.values():
+        for i in range(0, len(group), batch_size):
+            input_ids, attention_mask, token_type_ids = pad_batch(group[i:i + batch_size])
+            batches.append({
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": token_type_ids,
+            })
+    return batches
+
+
+def search_space(cores, concurrency) -> dict:
+    threads = sorted({1, 2, max(1, cores // concurrency), cores})
+    return {
+        "intra_op_num_threads": [t for t in threads if t <= cores],
+        "execution_mode": ["sequential", "parallel"],
+        "inter_op_num_threads": [1, 2],
+        "allow_spinning": [True, False],
+        "enable_cpu_mem_arena": [True, False],
+        "enable_mem_pattern": [True, False],
+        "io_binding": [False, True],
+    }
+
+
+def measure(model_path, provider, config, batches, concurrency, rounds, graph_cache) -> dict:
+    options = config.session_options(concurrency=concurrency)
+    session, _ = create_session(model_path, provider, graph_cache, options, config.provider_options(provider))
+    warm_up(session, WARMUP_WIDTHS, (1, BATCH_LIMIT))
+    runner = SessionRunner(session, io_binding=config.io_binding)
+
+    work = [b for _ in range(rounds) for b in batches]
+    latencies = []
+    lock = threading.Lock()
+    next_batch = iter(work)
+
+    def worker():
+        while True:
+            with lock:
+                feeds = next(next_batch, None)
+            if feeds is None:
+                return
+            start = time.perf_counter()
+            runner.run(feeds)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    samples = sum(len(b["input_ids"]) for b in work)
+    latencies = np.array(latencies) * 1000
+    return {
+        "texts_per_sec": round(samples / wall, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+    }
+
+
+def better(candidate, best, objective) -> bool:
+    if objective == "throughput":
+        return candidate["texts_per_sec"] > best["texts_per_sec"] * 1.02   # ignore noise-level wins
+    return candidate["p95_ms"] < best["p95_ms"] * 0.98
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model-dir", help="Folder with model variants + tokenizer")
+    source.add_argument("--stand-in", action="store_true", help="Tune on a generated stand-in BERT")
+    parser.add_argument("--variant", default="fp32")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("NUM_WORKERS", 4)),
+                        help="Concurrent session.run calls (the API's INFERENCE_CONCURRENCY)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_LIMIT)
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the batches per candidate")
+    parser.add_argument("--objective", choices=["throughput", "p95"], default="throughput")
+    parser.add_argument("--output", default="ort_config.json")
+    args = parser.parse_args()
+
+    provider = (
+        "CUDAExecutionProvider"
+        if "CUDAExecutionProvider" in ort.get_available_providers()
+        else "CPUExecutionProvider"
+    )
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if args.stand_in:
+            from benchmarks.stand_in_model import build_stand_in
+
+            model_dir = build_stand_in(os.path.join(tmp, "stand_in"), [args.variant])
+        model_path = os.path.join(model_dir, variant_filename(args.variant))
+        batches = make_batches(AutoTokenizer.from_pretrained(model_dir), args.samples, args.batch_size)
+        graph_cache = os.path.join(tmp, "graphs")   # optimize the graph once, not per candidate
+
+        def run(config):
+            result = measure(model_path, provider, config, batches, args.concurrency, args.rounds, graph_cache)
+            print(f"  {result}  {config.to_dict()}")
+            history.append({"config": config.to_dict(), **result})
+            return result
+
+        history = []
+        best_config = ExecutionConfig()
+        print(f"Baseline ({cores} cores, {args.concurrency} concurrent batches, {provider}):")
+        best = run(best_config)
+
+        for field, values in search_space(cores, args.concurrency).items():
+            if field == "inter_op_num_threads" and best_config.execution_mode == "sequential":
+                continue   # only used by the parallel executor
+            print(f"{field}:")
+            for value in values:
+                if getattr(best_config, field) == value:
+                    continue
+                candidate = best_config.replace(**{field: value})
+                result = run(candidate)
+                if better(result, best, args.objective):
+                    best_config, best = candidate, result
+
+    report = {
+        "config": best_config.to_dict(),
+        "result": best,
+        "objective": args.objective,
+        "host": {
+            "cores": cores,
+            "machine": platform.machine(),
+            "provider": provider,
+            "onnxruntime": ort.__version__,
+        },
+        "workload": {
+            "model": "stand-in" if args.stand_in else os.path.abspath(model_path),
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "samples": args.samples,
+        },
+        "history": history,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Best config {best_config.to_dict()} -> {best}")
+    print(f"   written to {args.output} (serve with ORT_CONFIG_PATH={args.output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,23 @@
 import streamlit as st
 from ui.chat_fragment import render_chat
 from ui.video_info import render_video_info
-from ui.sentiment_view import render_sentiment
+from ui.sentiment_view import render_sentiment, render_partial_sentiment
 
 import streamlit as st
 import matplotlib.pyplot as plt
 from utils import extract_video_id
-from services.comment_sentiment import analyze_sentiment
-from services.yt_service import get_video_info, get_video_comments, get_video_transcript
+from services.comment_pipeline import analyze_video_comments
+from services.comment_sampling import analyze_comments_sampled
+from services.orchestrator import PipelineRun, StageError
+from services.yt_service import get_video_comments, get_video_info, get_video_transcript
 from services.video_summarize import summarize_video
-from utils import merge_comments_with_sentiment, sentiment_statistics, merge_transcript_by_time
+from utils import merge_transcript_by_time
+from comment_table import CommentTable
 from rag_pipeline.build_vectorstore import build_comment_vectorstore, build_transcript_vectorstore
 from rag_pipeline.chain import get_session_rag_chain, get_session_direct_chain
 from rag_pipeline.router import semantic_router
 from rag_pipeline.gemini_embedding import GeminiEmbedding
 
-# =========================
-# Define cached functions
-# =========================
-@st.cache_data(show_spinner=False)
-def cached_get_video_comments(video_id, max_results):
-    return get_video_comments(video_id, max_results)
-
-@st.cache_data(show_spinner=False)
-def cached_analyze_sentiment(texts):
-    return analyze_sentiment(texts)
-
-@st.cache_data(show_spinner=False)
-def cached_get_video_transcript(video_id):
-    return get_video_transcript(video_id)
-
-@st.cache_data(show_spinner=False)
-def cached_summarize_video(video_url):
-    return summarize_video(video_url)
-
 # =========================
 # Initialize session state
 # =========================
@@ -67,9 +51,63 @@ if "embedder" not in st.session_state:
 if "chat_enabled" not in st.session_state:
     st.session_state.chat_enabled = False
 
+if "pipeline" not in st.session_state:
+    st.session_state.pipeline = None
+
+if "pipeline_seen" not in st.session_state:
+    st.session_state.pipeline_seen = set()
+
 # =========================
 # Define constants
 MAX_COMMENTS = 200
+SAMPLING_MIN_COMMENTS = 2000  # bigger videos default to a sampled estimate instead of the newest MAX_COMMENTS
+PIPELINE_POLL_SECONDS = 1.0  # how often the page checks for background stages that have finished
+
+
+# =========================
+# Background pipeline
+# =========================
+def defaults_to_sampling(info):
+    return bool(info and info["comments"] > SAMPLING_MIN_COMMENTS)
+
+
+def prefetch_comments(video_id, info):
+    # Warms the cache for a full analysis; sampled estimates fetch their own pages uncached, so skip it there
+    if defaults_to_sampling(info):
+        return None
+    return get_video_comments(video_id, MAX_COMMENTS)
+
+
+def start_pipeline(video_id):
+    # Everything that doesn't need the user's input starts as soon as the URL is valid:
+    # info, transcript and summary in parallel, the comments once info says a full analysis is the default,
+    # the transcript index once its inputs land.
+    run = PipelineRun(key=video_id)
+    run.add("info", lambda: get_video_info(video_id), fast=True)
+    run.add("comments", lambda info: prefetch_comments(video_id, info), deps=("info",), fast=True)
+    run.add("transcript", lambda: get_video_transcript(video_id), fast=True)
+    run.add("summary", lambda: summarize_video(video_id))
+    run.add("embedder", GeminiEmbedding)
+    run.add(
+        "transcript_vectorstore",
+        lambda transcript, embedder: build_transcript_vectorstore(
+            merge_transcript_by_time(transcript, max_duration=90.0), embeddings=embedder),
+        deps=("transcript", "embedder"),
+    )
+    return run.start()
+
+
+def index_comments(run, comments):
+    # Chat index of the analyzed comments, built in the background before the chat is opened
+    run.add("comment_vectorstore", lambda embedder: build_comment_vectorstore(comments, embeddings=embedder),
+            deps=("embedder",))
+
+
+@st.fragment(run_every=PIPELINE_POLL_SECONDS)
+def watch_pipeline(run):
+    # Rerun the page when a background stage lands, so its result shows up without a click
+    if run.finished() != st.session_state.pipeline_seen:
+        st.rerun()
 
 
 # =========================
@@ -96,11 +134,24 @@ if url:
     else:
         status.empty()
         st.success("✅ URL processed successfully.")
-        
-        info = get_video_info(video_id)
+
+        run = st.session_state.pipeline
+        if run is None or run.key != video_id:
+            if run is not None:
+                run.cancel()
+            run = st.session_state.pipeline = start_pipeline(video_id)
+        st.session_state.pipeline_seen = run.finished()   # what this render shows
+        if run.pending():
+            watch_pipeline(run)
+
+        try:
+            info = run.result("info")
+        except StageError as e:
+            st.error(f"❌ {e}")
+            st.stop()
         if info:
             st.divider()
-            render_video_info(info, cached_summarize_video, url)
+            render_video_info(info, run)
 
         if video_id != st.session_state.last_video_id:
             # Core data
@@ -119,6 +170,7 @@ if url:
 
             # Reset UI options
             st.session_state.use_comment_likes = False
+            st.session_state.use_sampling = defaults_to_sampling(info)
 
             st.rerun()
 
@@ -127,42 +179,95 @@ if url:
         left_col, right_col = st.columns([1.2, 1])
 
         with left_col:
+            st.checkbox(
+                "Estimate from a sample",
+                key="use_sampling",
+                disabled=st.session_state.analysis_done,
+                help="Scores a like-stratified sample of the comments, newest first, and stops once the estimate is precise enough."
+            )
+            st.checkbox(
+                "Include replies",
+                key="include_replies",
+                disabled=st.session_state.analysis_done or st.session_state.use_sampling,
+                help="Also analyze reply threads, most-replied first, within the daily YouTube API quota."
+            )
+
             if st.button(
                 "Analyze Video",
                 disabled=st.session_state.analysis_done,
                 help="Could take a few minutes for videos with many comments."):
 
-                st.write(f"Maximum {MAX_COMMENTS} comments are analyzed.")
-                with st.spinner("🔄 Fetching comments & analyzing sentiment..."):
-                    
-                    comments = cached_get_video_comments(video_id, max_results=MAX_COMMENTS)
-                    texts = [{"text": c["text"]} for c in comments]
-
-                    predictions = cached_analyze_sentiment(texts)
-                    st.session_state.comment = merge_comments_with_sentiment(comments, predictions)
-
-                    st.session_state.stats = sentiment_statistics(st.session_state.comment)
-
-                    st.session_state.analysis_done = True
+                progress = st.progress(0.0, text="🔄 Fetching comments & analyzing sentiment...")
+                partial = st.empty()
+                comments = CommentTable()
+                stats = comments.statistics()
+
+                if st.session_state.use_sampling:
+                    # Stops fetching and scoring once the intervals reach the target precision
+                    population = info["comments"] if info else None
+                    for comments, stats in analyze_comments_sampled(video_id, population=population):
+                        sampling = stats["sampling"]
+                        progress.progress(
+                            min(sampling["target_ci"] / sampling["max_ci"], 1.0) if sampling["max_ci"] else 0.0,
+                            text=f"🔄 Scored {sampling['scored']} of {sampling['fetched']} fetched comments "
+                                 f"(±{sampling['max_ci']} pts, target ±{sampling['target_ci']})..."
+                        )
+                        with partial.container():
+                            render_partial_sentiment(stats)
+                else:
+                    st.write(f"The {MAX_COMMENTS} most recent comments are analyzed (newest first, not YouTube's top comments).")
+
+                    # First analysis: each page is classified while the next one is fetched, stats update per page.
+                    # Already analyzed videos only fetch and score comments posted since the last run.
+                    target = min(MAX_COMMENTS, info["comments"]) if info and info["comments"] else MAX_COMMENTS
+                    replies = st.session_state.include_replies
+                    run.wait("comments")   # fetched in the background since the URL was entered (unless sampling was the default)
+                    for comments, stats in analyze_video_comments(video_id, MAX_COMMENTS, include_replies=replies):
+                        progress.progress(
+                            min(len(comments) / target, 1.0),
+                            text=f"🔄 Analyzed {len(comments)} of ~{target} comments..."
+                        )
+                        with partial.container():
+                            render_partial_sentiment(stats)
+
+                progress.empty()
+                partial.empty()
+
+                st.session_state.comment, st.session_state.stats = comments, stats
+                st.session_state.analysis_done = True
+                index_comments(run, comments)
 
             if st.session_state.analysis_done:
+                if not st.session_state.use_sampling and st.button(
+                        "🔄 Refresh (new comments only)",
+                        help="Scores comments posted since the last analysis and updates like counts."):
+                    with st.spinner("🔄 Fetching new comments..."):
+                        known_ids = set(st.session_state.comment.ids)
+                        replies = st.session_state.include_replies
+                        for comments, stats in analyze_video_comments(video_id, MAX_COMMENTS, include_replies=replies):
+                            pass
+                    st.session_state.comment, st.session_state.stats = comments, stats
+                    if not st.session_state.chat_enabled:
+                        index_comments(run, comments)
+                    st.toast(f"{len(set(comments.ids) - known_ids)} new comment(s) analyzed.")
+
                 render_sentiment(st.session_state.stats)
 
         with right_col:
             if st.session_state.analysis_done:
                 if st.button("Chat with AI about this video",
                             disabled=st.session_state.chat_enabled):
+                    # Both indexes are normally built already; only what is still running is waited for
                     with st.spinner("⚙️ Setting up chat..."):
-                        st.session_state.embedder = GeminiEmbedding()
-                        st.session_state.comment_vectorstore = build_comment_vectorstore(st.session_state.comment, embeddings=st.session_state.embedder)
-
-                        transcript = cached_get_video_transcript(video_id)
-                        merged_transcript = merge_transcript_by_time(transcript, max_duration=90.0)
-
-                        st.session_state.transcript_vectorstore = build_transcript_vectorstore(merged_transcript, embeddings=st.session_state.embedder)
-                        
-                        st.session_state.chat_enabled = True
-                        st.rerun()
+                        try:
+                            st.session_state.embedder = run.result("embedder")
+                            st.session_state.comment_vectorstore = run.result("comment_vectorstore")
+                            st.session_state.transcript_vectorstore = run.result("transcript_vectorstore")
+                        except StageError as e:
+                            st.error(f"❌ Chat setup failed: {e}")
+                        else:
+                            st.session_state.chat_enabled = True
+                            st.rerun()
                 if st.session_state.chat_enabled:
                     chat_box = st.container(height=800, border=False)
                     with chat_box:
@@ -0,0 +1,94 @@
+"""
+Comment storage and statistics: per-page dict merging + Counter statistics vs the columnar CommentTable.
+
+Usage (from the frontend folder):
+    python -m benchmarks.comment_table_bench --comments 300000
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from comment_table import CommentTable
+from utils import merge_comments_with_sentiment, sentiment_statistics
+
+PAGE = 100
+
+
+def synthetic_pages(n, seed=0):
+    rng = random.Random(seed)
+    texts = ["first", "great video", "lol", "thanks!"] + [f"comment number {i} about this video" for i in range(n // 2)]
+    pages = []
+    for start in range(0, n, PAGE):
+        page = [{
+            "id": f"c{i}",
+            "author": f"user{rng.randrange(n // 4 or 1)}",
+            "text": rng.choice(texts),
+            "likeCount": int(rng.paretovariate(1.2)) - 1,
+            "publishedAt": f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00Z",
+        } for i in range(start, min(start + PAGE, n))]
+        predictions = {"results": [{"predicted_class": rng.randrange(3)} for _ in page]}
+        pages.append((page, predictions))
+    return pages
+
+
+def dict_pipeline(pages, every_page):
+    merged = []
+    for page, predictions in pages:
+        merged.extend(merge_comments_with_sentiment(page, predictions))
+        if every_page:
+            sentiment_statistics(merged)
+    return merged, sentiment_statistics(merged)
+
+
+def table_pipeline(pages, every_page):
+    table = CommentTable()
+    for page, predictions in pages:
+        table.append(page, [r["predicted_class"] for r in predictions["results"]])
+        if every_page:
+            table.statistics()
+    return table, table.statistics()
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {elapsed * 1000:9.1f} ms  peak {peak / 2 ** 20:7.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=300_000)
+    parser.add_argument("--stream-comments", type=int, default=20_000,
+                        help="comments for the run that recomputes statistics after every page")
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.comments)
+    print(f"{args.comments:,} comments in {len(pages):,} pages")
+
+    merged, dict_stats = measure("dicts + Counter statistics", lambda: dict_pipeline(pages, False))
+    table, table_stats = measure("CommentTable + bincount statistics", lambda: table_pipeline(pages, False))
+    assert dict_stats == table_stats
+
+    dict_only = measure("statistics only (dicts)", lambda: sentiment_statistics(merged))
+    assert measure("statistics only (CommentTable)", table.statistics) == dict_only
+
+    stream = pages[:args.stream_comments // PAGE]
+    print(f"\nstatistics after every page, {args.stream_comments:,} comments:")
+    measure("dicts", lambda: dict_pipeline(stream, True))
+    measure("CommentTable", lambda: table_pipeline(stream, True))
+
+    dict_bytes = sys.getsizeof(merged) + sum(sys.getsizeof(item) for item in merged)
+    print(f"\nrow containers: {dict_bytes / 2 ** 20:.1f} MiB of dicts vs "
+          f"{sum(getattr(table, f'_{name}').nbytes for name in (*table._NUMERIC, *table._OBJECT)) / 2 ** 20:.1f} MiB "
+          f"of columns ({len(table._texts.values):,} distinct texts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Comment cleaning speed: the old three re.sub passes per comment vs the batch preprocessing engine.
+Also checks that both give the same output on ASCII comments, and that non-ASCII comments match a
+per-character reference of the old cleaning that keeps Unicode letters and their combining marks.
+
+Usage (from the frontend folder):
+    python -m benchmarks.preprocess_bench --samples 100000
+    python -m benchmarks.preprocess_bench --samples 100000 --workers 4
+"""
+import argparse
+import random
+import re
+import time
+import unicodedata
+
+from preprocess import PREPROCESS_WORKERS, clean_texts, split_sentences_batch
+
+WORDS = ["great", "video", "thanks", "love", "this", "song", "worst", "ever", "lol", "bro",
+         "hay", "quá", "cảm", "ơn", "bạn", "привет", "спасибо", "最高", "です", "नमस्ते", "दुनिया", "ขอบคุณ", "ครับ"]
+EXTRAS = ["🔥🔥", "😂", "!!!", "https://youtu.be/abc123", "@someone", "#tag", "www.example.com", "...", "❤️",
+          "don't", "it's", "I'm", "e-mail", "snake_case", "10/10", "(lol)"]
+# Pieces that interact across the old passes: links inside words, mentions touching links or symbols
+FUZZ_PIECES = ["http", "https://a.b/c", "www", "www.x", "@", "@me", "#", "_", "'", "-", ".", "!", " ", "  ",
+               "\t", "\n", "a", "B", "7", "xyz", "don't",
+               "नमस्ते", "\u094d", "ขอบคุณ", "\u0e48", "e\u0301", "❤️", "\ufe0f", "đ", "最高"]
+
+
+def synthetic_comments(n, seed=0) -> list[str]:
+    rng = random.Random(seed)
+    comments = []
+    for _ in range(n):
+        parts = rng.choices(WORDS, k=rng.randint(3, 30)) + rng.choices(EXTRAS, k=rng.randint(0, 3))
+        rng.shuffle(parts)
+        comments.append(" ".join(parts))
+    return comments
+
+
+def fuzz_comments(n, seed=0) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choices(FUZZ_PIECES, k=rng.randint(1, 12))) for _ in range(n)]
+
+
+def legacy_clean_text(text):
+    # utils.clean_text before the batch engine
+    text = re.sub(r"http\S+|www\S+|https\S+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"\@\w+|\#", "", text)
+    text = re.sub(r"[^A-Za-z0-9\s]+", "", text)
+    return text.strip()
+
+
+def _is_mark(c):
+    return unicodedata.category(c)[0] == "M"
+
+
+def reference_clean_text(text):
+    # The old passes one character at a time, with Unicode letters/digits in place of [A-Za-z0-9]:
+    # combining marks stay when they follow a kept letter, digit or mark, mentions take their marks along
+    text = re.sub(r"http\S+|www\S+", "", unicodedata.normalize("NFC", text))
+    out, i = [], 0
+    while i < len(text):
+        c = text[i]
+        if c == "@" and i + 1 < len(text) and (text[i + 1].isalnum() or text[i + 1] == "_" or _is_mark(text[i + 1])):
+            i += 1
+            while i < len(text) and (text[i].isalnum() or text[i] == "_" or _is_mark(text[i])):
+                i += 1
+            continue
+        i += 1
+        if c.isalnum() or c.isspace():
+            out.append(c)
+        elif _is_mark(c) and i > 1 and out and out[-1] is not None and not out[-1].isspace() and (
+                text[i - 2].isalnum() or _is_mark(text[i - 2])) and text[i - 2] != "_":
+            out.append(c)
+        else:
+            out.append(None)   # deleted; a mark right after it goes too
+    return "".join(c for c in out if c is not None).strip()
+
+
+def check_parity(texts):
+    # Old and new cleaning must agree on ASCII text; non-ASCII text is checked against the reference
+    ok = True
+    for label, subset, reference in (("legacy", [t for t in texts if t.isascii()], legacy_clean_text),
+                                     ("reference", [t for t in texts if not t.isascii()], reference_clean_text)):
+        mismatches = [(t, reference(t), c)
+                      for t, c in zip(subset, clean_texts(subset, threshold=float("inf")))
+                      if reference(t) != c]
+        for text, old, new in mismatches[:5]:
+            print(f"  mismatch: {text!r}: {label} {old!r}, new {new!r}")
+        kind = "ASCII" if label == "legacy" else "non-ASCII"
+        print(f"same output as {label} on {len(subset) - len(mismatches):,} of {len(subset):,} {kind} texts")
+        ok = ok and not mismatches
+    return ok
+
+
+def timed(label, fn, samples):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {samples / elapsed:12,.0f} texts/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=PREPROCESS_WORKERS)
+    args = parser.parse_args()
+
+    texts = synthetic_comments(args.samples)
+    print(f"{args.samples:,} comments, {args.workers} worker process(es)")
+
+    timed("legacy clean_text (3 passes)", lambda: [legacy_clean_text(t) for t in texts], args.samples)
+    serial = timed("clean_texts (serial)", lambda: clean_texts(texts, threshold=float("inf")), args.samples)
+    if args.workers > 1:
+        clean_texts(texts[:args.workers], threshold=0, workers=args.workers)   # start the pool outside the timing
+        parallel = timed("clean_texts (process pool)", lambda: clean_texts(texts, threshold=0, workers=args.workers),
+                         args.samples)
+        assert parallel == serial
+    timed("split_sentences_batch", lambda: split_sentences_batch(texts), args.samples)
+
+    parity = check_parity(texts + fuzz_comments(args.samples))
+    kept = sum(1 for t in serial if t)
+    legacy_kept = sum(1 for t in (legacy_clean_text(t) for t in texts) if t)
+    print(f"non-empty after cleaning: {kept:,} (legacy: {legacy_kept:,})")
+    if not parity:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
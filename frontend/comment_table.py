@@ -0,0 +1,204 @@
+import numpy as np
+
+from utils import SENTIMENT_MAP, statistics_from_counters
+
+LABELS = [SENTIMENT_MAP[i] for i in range(len(SENTIMENT_MAP))]
+UNSCORED = -1
+
+
+class _Interner:
+    # Each distinct string stored once; rows keep an int32 index
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._index = {v: i for i, v in enumerate(self.values)}
+
+    def ids(self, strings) -> np.ndarray:
+        index, values = self._index, self.values
+        out = np.empty(len(strings), dtype=np.int32)
+        for i, s in enumerate(strings):
+            j = index.get(s)
+            if j is None:
+                j = index[s] = len(values)
+                values.append(s)
+            out[i] = j
+        return out
+
+    def compact(self, ids) -> tuple:
+        """New interner holding only the strings `ids` point at, and `ids` renumbered for it."""
+        used, inverse = np.unique(ids, return_inverse=True)
+        return _Interner(self.values[i] for i in used), inverse.astype(np.int32).reshape(-1)
+
+
+class CommentTable:
+    """
+    Comments with their sentiment, stored column by column.
+
+    Label IDs, like counts and publish times are NumPy arrays, texts and
+    authors are interned, so a video's comments cost a few bytes per row plus
+    each distinct string once. Columns grow by doubling, so appending a page
+    doesn't copy what is already stored. Per-label counts come from bincount.
+
+    Iterating yields one dict per row in the `merge_comments_with_sentiment`
+    shape, for consumers that want records (e.g. the chat vectorstore).
+    """
+
+    _NUMERIC = {"labels": (np.int8, UNSCORED), "likes": (np.int64, 0), "published": (np.int64, -1),
+                "text_ids": (np.int32, 0), "author_ids": (np.int32, 0)}
+    _OBJECT = ("ids", "parent_ids")
+
+    def __init__(self, texts=None, authors=None):
+        self._size = 0
+        self._capacity = 0
+        self._texts = texts or _Interner()
+        self._authors = authors or _Interner()
+        for name, (dtype, _) in self._NUMERIC.items():
+            setattr(self, f"_{name}", np.empty(0, dtype=dtype))
+        for name in self._OBJECT:
+            setattr(self, f"_{name}", np.empty(0, dtype=object))
+
+    def __len__(self):
+        return self._size
+
+    # Read-only views of the filled part of each column
+    @property
+    def labels(self) -> np.ndarray:
+        return self._labels[:self._size]
+
+    @property
+    def likes(self) -> np.ndarray:
+        return self._likes[:self._size]
+
+    @property
+    def published(self) -> np.ndarray:
+        return self._published[:self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def parent_ids(self) -> np.ndarray:
+        return self._parent_ids[:self._size]
+
+    @property
+    def is_reply(self) -> np.ndarray:
+        return self.parent_ids != None  # noqa: E711 (elementwise on an object array)
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 256)
+        for name in (*self._NUMERIC, *self._OBJECT):
+            old = getattr(self, f"_{name}")
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, f"_{name}", new)
+        self._capacity = capacity
+
+    def append(self, comments, class_ids=None) -> int:
+        """Add comments as returned by yt_service (optionally already scored); returns the first new row."""
+        start, n = self._size, len(comments)
+        self._reserve(n)
+        end = start + n
+
+        self._ids[start:end] = [c.get("id") for c in comments]
+        self._parent_ids[start:end] = [c.get("parentId") for c in comments]
+        self._text_ids[start:end] = self._texts.ids([c["text"] for c in comments])
+        self._author_ids[start:end] = self._authors.ids([c.get("author", "") for c in comments])
+        self._likes[start:end] = [c.get("likeCount", 0) for c in comments]
+        self._published[start:end] = _parse_times([c.get("publishedAt", "") for c in comments])
+        self._labels[start:end] = UNSCORED if class_ids is None else class_ids
+
+        self._size = end
+        return start
+
+    def set_likes(self, rows, likes):
+        self._likes[:self._size][rows] = likes
+
+    def take(self, rows) -> "CommentTable":
+        """New table with the selected rows (index array or boolean mask) and only their strings."""
+        table = CommentTable()
+        for name in (*self._NUMERIC, *self._OBJECT):
+            setattr(table, f"_{name}", getattr(self, f"_{name}")[:self._size][rows].copy())
+        table._size = table._capacity = len(table._labels)
+        table._texts, table._text_ids = self._texts.compact(table._text_ids)
+        table._authors, table._author_ids = self._authors.compact(table._author_ids)
+        return table
+
+    def counters(self, rows=slice(None)) -> dict:
+        # Per-label comment and like counts of the scored rows; JSON-friendly, see utils.statistics_from_counters
+        labels, likes = self.labels[rows], self.likes[rows]
+        scored = labels >= 0
+        comments = np.bincount(labels[scored], minlength=len(LABELS))
+        like_sums = np.bincount(labels[scored], weights=np.maximum(likes[scored], 0), minlength=len(LABELS))
+        return {
+            "comments": {label: int(comments[i]) for i, label in enumerate(LABELS)},
+            "likes": {label: int(like_sums[i]) for i, label in enumerate(LABELS)},
+        }
+
+    def statistics(self) -> dict:
+        return statistics_from_counters(self.counters())
+
+    def newest_published(self) -> str:
+        published = self.published[~self.is_reply] if self._size else self.published
+        if not len(published) or published.max() < 0:
+            return ""
+        return _format_time(published.max())
+
+    def row(self, i) -> dict:
+        item = {
+            "id": self._ids[i],
+            "author": self._authors.values[self._author_ids[i]],
+            "text": self._texts.values[self._text_ids[i]],
+            "likeCount": int(self._likes[i]),
+            "publishedAt": _format_time(self._published[i]) if self._published[i] >= 0 else "",
+            "sentiment": LABELS[self._labels[i]] if self._labels[i] >= 0 else None,
+        }
+        if self._parent_ids[i] is not None:
+            item["parentId"] = self._parent_ids[i]
+        return item
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.row(i)
+
+    def to_dict(self) -> dict:
+        # Columnar and JSON-friendly, for the persistent cache; only strings still referenced are written
+        texts, text_ids = self._texts.compact(self._text_ids[:self._size])
+        authors, author_ids = self._authors.compact(self._author_ids[:self._size])
+        return {
+            "ids": self.ids.tolist(),
+            "parent_ids": self.parent_ids.tolist(),
+            "texts": texts.values,
+            "text_ids": text_ids.tolist(),
+            "authors": authors.values,
+            "author_ids": author_ids.tolist(),
+            "likes": self.likes.tolist(),
+            "published": self.published.tolist(),
+            "labels": self.labels.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data) -> "CommentTable":
+        table = cls(_Interner(data["texts"]), _Interner(data["authors"]))
+        n = len(data["ids"])
+        table._reserve(n)
+        table._ids[:n] = data["ids"]
+        table._parent_ids[:n] = data["parent_ids"]
+        for name in cls._NUMERIC:
+            getattr(table, f"_{name}")[:n] = data[name]
+        table._size = n
+        return table
+
+
+def _parse_times(values) -> np.ndarray:
+    # ISO 8601 "2024-01-31T12:00:00Z" -> epoch seconds, -1 when missing
+    times = np.array([v.rstrip("Z") if v else "NaT" for v in values], dtype="datetime64[s]")
+    seconds = times.astype(np.int64)
+    seconds[np.isnat(times)] = -1
+    return seconds
+
+
+def _format_time(seconds) -> str:
+    return f"{np.datetime64(int(seconds), 's')}Z"
@@ -0,0 +1,95 @@
+import itertools
+import multiprocessing
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+# Same output as the original three re.sub passes on ASCII text: links go first (they can start mid-word),
+# then @mentions and every run of symbols (punctuation, emoji, '#', '_') are deleted in one pass, so
+# "don't" -> "dont" and "e-mail" -> "email". \w is Unicode-aware, so Vietnamese, Cyrillic, CJK... comments
+# keep their letters, which the old [^A-Za-z0-9\s] dropped.
+LINK_PATTERN = re.compile(r"http\S+|www\S+")
+CLEAN_PATTERN = re.compile(r"@\w+|(?:[^\w\s@]|_)+|@")
+
+
+def _combining_marks() -> str:
+    # Regex matching one combining mark (Unicode category M). All of them sit below U+20000 or in the
+    # variation selectors supplement, so scanning those is enough (~20 ms at import). re only has a fast
+    # lookup table for BMP classes, so the few astral marks sit behind a cheap range check.
+    cat = unicodedata.category
+    bmp, astral = [], []
+    for cp in itertools.chain(range(0x20000), range(0xE0100, 0xE01F0)):
+        if cat(chr(cp))[0] == "M":
+            (bmp if cp < 0x10000 else astral).append(re.escape(chr(cp)))
+    return rf"(?:[{''.join(bmp)}]|(?=[\U00010000-\U0010FFFF])[{''.join(astral)}])"
+
+
+# Non-ASCII text: \w doesn't match combining marks (Devanagari/Thai vowel signs, viramas, tone marks...).
+# Texts without any go through CLEAN_PATTERN. Otherwise a symbol run may only start at a mark that
+# doesn't follow a letter, digit or mark: marks after a letter stay with it, marks inside a run (like
+# the emoji variation selector in "❤️") go with the run, and mentions swallow theirs.
+_MARK = _combining_marks()
+MARK_PATTERN = re.compile(_MARK)
+CLEAN_PATTERN_MARKS = re.compile(
+    rf"@(?:\w|{_MARK})+|(?:(?!{_MARK})(?:[^\w\s@]|_)|(?<![^\W_])(?<!{_MARK}){_MARK})(?:[^\w\s@]|_)*|@"
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+PARALLEL_THRESHOLD = int(os.getenv("PREPROCESS_PARALLEL_THRESHOLD", 50_000))  # texts per call before using processes
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", 0)) or os.cpu_count() or 1
+CHUNK_SIZE = 5_000
+
+_pool = None
+
+
+def clean_text(text: str) -> str:
+    return _clean_chunk([text])[0]
+
+
+def _clean_chunk(texts):
+    normalize, sub_links, has_marks = unicodedata.normalize, LINK_PATTERN.sub, MARK_PATTERN.search
+    sub, sub_marks = CLEAN_PATTERN.sub, CLEAN_PATTERN_MARKS.sub
+    cleaned = []
+    for text in texts:
+        if "http" in text or "www" in text:
+            text = sub_links("", text)
+        if not text.isascii():
+            # NFC first, so decomposed accents (e.g. from macOS input) become single letters
+            text = normalize("NFC", text)
+            if has_marks(text):
+                cleaned.append(sub_marks("", text).strip())
+                continue
+        cleaned.append(sub("", text).strip())
+    return cleaned
+
+
+def clean_texts(texts, threshold=PARALLEL_THRESHOLD, workers=PREPROCESS_WORKERS) -> list[str]:
+    """
+    clean_text over a whole list. Lists of `threshold` texts or more are split
+    into chunks and cleaned in a process pool (kept for the life of the app).
+    """
+    texts = list(texts)
+    if len(texts) < threshold or workers < 2:
+        return _clean_chunk(texts)
+
+    chunks = [texts[i:i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+    return [t for chunk in _get_pool(workers).map(_clean_chunk, chunks) for t in chunk]
+
+
+def split_sentences(text: str) -> list[str]:
+    # Split by . ? !
+    return SENTENCE_END.split(text)
+
+
+def split_sentences_batch(texts) -> list[list[str]]:
+    split = SENTENCE_END.split
+    return [split(t) for t in texts]
+
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        # Not fork: the app process runs Streamlit, HTTP and pipeline threads whose locks a fork would copy
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
@@ -0,0 +1,255 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Per-resource time-to-live in seconds; counts on a video change quickly, transcripts almost never
+DEFAULT_TTLS = {
+    "video_info": int(os.getenv("CACHE_TTL_VIDEO_INFO", 60 * 60)),
+    "comments": int(os.getenv("CACHE_TTL_COMMENTS", 6 * 60 * 60)),
+    "transcript": int(os.getenv("CACHE_TTL_TRANSCRIPT", 30 * 24 * 60 * 60)),
+    "summary": int(os.getenv("CACHE_TTL_SUMMARY", 30 * 24 * 60 * 60)),
+    "analysis": int(os.getenv("CACHE_TTL_ANALYSIS", 30 * 24 * 60 * 60)),  # scored comments + counters, refreshed incrementally
+    "quota": 2 * 24 * 60 * 60,  # YouTube API units used per day (counters)
+}
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.path.expanduser("~"), ".cache", "yt_analyzer", "cache.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 512 * 1024 * 1024))  # compressed payload bytes kept on disk
+
+
+class CacheStore:
+    """
+    Persistent cache for YouTube / Gemini responses, shared by every session
+    and every app process on the same host.
+
+    Entries are keyed by (resource, key), usually the video ID; payloads are
+    zlib-compressed JSON. Each resource has its own TTL; once the total payload
+    size exceeds `max_bytes`, least recently read entries are evicted first.
+    Any SQLite error is treated as a miss, so a broken cache never breaks the app.
+
+    Integer counters (`incr` / `counters`) live in their own table and are
+    updated with atomic SQL increments, so processes sharing the file never
+    overwrite each other's counts. Without a usable file they are kept in memory.
+
+    The file is opened in WAL mode, which needs shared memory on one machine:
+    keep it on a local disk, never on an NFS/SMB volume shared by replicas.
+    Each host (replica) has its own cache and its own quota counters.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, max_bytes=CACHE_MAX_BYTES, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._memory_counters = {}   # fallback when the file can't be used
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    resource TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (resource, key)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    resource TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (resource, key)
+                )
+            """)
+            self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Cache disabled, could not open {path}: {e}")
+            self._conn = None
+
+    def get(self, resource, key):
+        """Cached value, or None when missing or expired."""
+        if self._conn is None:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT payload, expires_at FROM entries WHERE resource = ? AND key = ?",
+                    (resource, str(key)),
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._conn.execute(
+                        "UPDATE entries SET accessed_at = ? WHERE resource = ? AND key = ?",
+                        (now, resource, str(key)),
+                    )
+                    self._conn.commit()
+        except sqlite3.Error:
+            row = None
+
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, resource, key, value, ttl=None):
+        if self._conn is None:
+            return
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        ttl = self.ttls.get(resource, 60 * 60) if ttl is None else ttl
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (resource, key, payload, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (resource, str(key), payload, len(payload), now + ttl, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Cache write failed for {resource}/{key}: {e}")
+
+    def incr(self, resource, increments, limits=None, ttl=None):
+        """
+        Atomically add {key: amount} to counters under `resource` and return their new values.
+        With `limits` ({key: max}), nothing is added and None is returned if any counter would
+        go over its limit. The check and the increments run in one write transaction.
+        """
+        now = time.time()
+        ttl = self.ttls.get(resource, 60 * 60) if ttl is None else ttl
+        keys = [str(k) for k in increments]
+        amounts = [increments[k] for k in increments]
+        limits = {str(k): v for k, v in (limits or {}).items()}
+
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    self._conn.execute("BEGIN IMMEDIATE")   # takes the write lock before reading
+                    try:
+                        current = self._read_counters(resource, keys, now)
+                        if any(current[k] + a > limits[k] for k, a in zip(keys, amounts) if k in limits):
+                            self._conn.rollback()
+                            return None
+                        self._conn.executemany(
+                            "INSERT INTO counters (resource, key, value, expires_at) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT (resource, key) DO UPDATE SET "
+                            "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                            "expires_at = excluded.expires_at",
+                            [(resource, k, a, now + ttl, now) for k, a in zip(keys, amounts)],
+                        )
+                        values = self._read_counters(resource, keys, now)
+                        self._conn.commit()
+                        return values
+                    except BaseException:
+                        self._conn.rollback()
+                        raise
+            except sqlite3.Error as e:
+                print(f"⚠️ Counter update failed for {resource}, counting in memory: {e}")
+
+        with self._lock:
+            counters = self._memory_counters.setdefault(resource, {})
+            if any(counters.get(k, 0) + a > limits[k] for k, a in zip(keys, amounts) if k in limits):
+                return None
+            for k, a in zip(keys, amounts):
+                counters[k] = counters.get(k, 0) + a
+            return {k: counters[k] for k in keys}
+
+    def counters(self, resource, keys) -> dict:
+        """Current values of counters under `resource` (0 when missing or expired)."""
+        keys = [str(k) for k in keys]
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    return self._read_counters(resource, keys, time.time())
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            counters = self._memory_counters.get(resource, {})
+            return {k: counters.get(k, 0) for k in keys}
+
+    def _read_counters(self, resource, keys, now) -> dict:
+        values = {k: 0 for k in keys}
+        if keys:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM counters WHERE resource = ? AND expires_at > ? "
+                f"AND key IN ({', '.join('?' * len(keys))})",
+                (resource, now, *keys),
+            ).fetchall()
+            values.update(rows)
+        return values
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Least recently read first, down to 90% so every write doesn't evict again
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for resource, key, size in self._conn.execute(
+            "SELECT resource, key, size FROM entries ORDER BY accessed_at"
+        ):
+            doomed.append((resource, key))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE resource = ? AND key = ?", doomed)
+
+    def cached(self, resource, dump=None, load=None):
+        """
+        Decorator: cache a function's result under `resource`, keyed by its
+        positional arguments. `dump`/`load` convert values that aren't plain
+        JSON. None results (e.g. video not found) are not cached.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args):
+                key = "|".join(str(a) for a in args)
+                value = self.get(resource, key)
+                if value is not None:
+                    return load(value) if load else value
+
+                result = fn(*args)
+                if result is not None:
+                    self.set(resource, key, dump(result) if dump else result)
+                return result
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        entries, size = 0, 0
+        if self._conn is not None:
+            try:
+                with self._lock:
+                    entries, size = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                    ).fetchone()
+            except sqlite3.Error:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+cache = CacheStore()
@@ -0,0 +1,163 @@
+import queue
+import threading
+
+import numpy as np
+
+from comment_table import LABELS, CommentTable
+from services.cache_store import cache
+from services.comment_sentiment import analyze_sentiment
+from services.yt_service import fetch_replies, get_comment_like_counts, get_new_comments, iter_comment_pages
+from utils import statistics_from_counters
+
+PREFETCH_PAGES = 2  # pages fetched ahead while the current one is being classified
+
+_DONE = object()
+
+
+def prefetch(pages, max_ahead=PREFETCH_PAGES):
+    """
+    Run the `pages` iterator in a background thread, keeping up to `max_ahead`
+    pages ready. Errors from the fetcher are re-raised in the consumer; closing
+    the consumer early stops the fetcher.
+    """
+    buffer = queue.Queue(maxsize=max_ahead)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=fetch, name="comment-prefetch", daemon=True).start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def analyze_comments_streaming(video_id, max_results, include_replies=False):
+    """
+    Fetch and classify comments page by page: each page is sent to the
+    sentiment API while the next one is being fetched. With `include_replies`,
+    reply threads are then fetched in parallel (within the YouTube quota
+    budget) and classified the same way.
+
+    Yields (table, stats) after every page, so partial statistics can be shown
+    while the rest is still loading. The same CommentTable grows in place and
+    stats are recounted from its label column, not rebuilt from the rows.
+    """
+    table = CommentTable()
+    threads = []
+    for page in prefetch(iter_comment_pages(video_id, max_results)):
+        table.append(page, _class_ids(analyze_sentiment(page)))
+        threads.extend(page)
+        yield table, table.statistics()
+
+    if include_replies:
+        for replies in prefetch(fetch_replies(video_id, threads)):
+            table.append(replies, _class_ids(analyze_sentiment(replies)))
+            yield table, table.statistics()
+
+
+def analyze_video_comments(video_id, max_results, refresh_likes=True, include_replies=False):
+    """
+    Analysis of the newest `max_results` comments, refreshed incrementally.
+
+    The first run streams the full fetch-and-classify pipeline. Later runs only
+    fetch comments newer than the newest stored one, score that delta, update
+    the stored per-label counters (dropping comments that fall out of the
+    window) and refresh like counts in bulk. Yields (table, stats) like
+    `analyze_comments_streaming`; the state is kept in the persistent cache.
+    Replies are fetched on the full run only; comments found by a refresh are
+    added without theirs.
+    """
+    state = cache.get("analysis", video_id)
+
+    if (state is None or "table" not in state or state["max_results"] < max_results
+            or state.get("include_replies", False) != include_replies):
+        table = stats = None
+        for table, stats in analyze_comments_streaming(video_id, max_results, include_replies):
+            yield table, stats
+        if table is None:
+            table = CommentTable()
+            yield table, table.statistics()
+        _save_state(video_id, max_results, include_replies, table, table.counters())
+        return
+
+    table, counters = CommentTable.from_dict(state["table"]), state["counters"]
+    known = len(table)
+
+    new_comments = get_new_comments(video_id, set(table.ids), table.newest_published(), max_results)
+    if new_comments:
+        start = table.append(new_comments, _class_ids(analyze_sentiment(new_comments)))
+        _add_counters(counters, table.counters(slice(start, None)))
+
+    # Keep the window at the newest `max_results` comments, with their replies
+    top_level = np.flatnonzero(~table.is_reply)
+    newest_first = top_level[np.argsort(-table.published[top_level], kind="stable")]
+    dropped_ids = table.ids[newest_first[max_results:]]
+    if len(dropped_ids):
+        dropped = np.isin(table.ids, dropped_ids) | np.isin(table.parent_ids, dropped_ids)
+        _add_counters(counters, table.counters(dropped), sign=-1)
+        known -= int(np.count_nonzero(dropped[:known]))
+        table = table.take(~dropped)
+
+    if refresh_likes:
+        _refresh_likes(table, np.arange(known), counters)   # new comments already have fresh counts
+
+    _save_state(video_id, max_results, include_replies, table, counters)
+    yield table, statistics_from_counters(counters)
+
+
+def _class_ids(predictions):
+    return [r["predicted_class"] for r in predictions["results"]]
+
+
+def _add_counters(counters, delta, sign=1):
+    for kind in ("comments", "likes"):
+        for label, value in delta[kind].items():
+            counters[kind][label] += sign * value
+
+
+def _refresh_likes(table, rows, counters):
+    rows = rows[table.ids[rows] != None]  # noqa: E711
+    like_counts = get_comment_like_counts(table.ids[rows].tolist())
+    old = table.likes[rows]
+    # Deleted comments keep their last known count
+    new = np.fromiter((like_counts.get(i, o) for i, o in zip(table.ids[rows], old)), dtype=np.int64, count=len(rows))
+    labels = table.labels[rows]
+    scored = labels >= 0
+    diff = np.bincount(labels[scored], weights=np.maximum(new, 0)[scored] - np.maximum(old, 0)[scored],
+                       minlength=len(LABELS))
+    for i, label in enumerate(LABELS):
+        counters["likes"][label] += int(diff[i])
+    table.set_likes(rows, new)
+
+
+def _save_state(video_id, max_results, include_replies, table, counters):
+    cache.set("analysis", video_id, {
+        "max_results": max_results,
+        "include_replies": include_replies,
+        "table": table.to_dict(),
+        "counters": counters,
+    })
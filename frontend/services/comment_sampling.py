@@ -0,0 +1,202 @@
+import math
+import os
+import zlib
+from bisect import bisect_right
+from statistics import NormalDist
+
+from comment_table import LABELS, CommentTable
+from services.comment_pipeline import prefetch
+from services.comment_sentiment import analyze_sentiment
+from services.yt_service import iter_comment_pages
+
+# Like-count strata (lower bounds) and the share of each one that is scored. Liked comments are
+# rare but carry most of the like-weighted distribution, so they are always scored.
+LIKE_STRATA = (0, 1, 10, 100)
+SAMPLE_RATES = tuple(float(r) for r in os.getenv("SAMPLE_RATES", "0.25,0.5,1,1").split(","))
+
+SAMPLE_TARGET_CI = float(os.getenv("SAMPLE_TARGET_CI", 2.0))  # ± percentage points on every raw share
+# A few very liked comments dominate the like-weighted shares, so their intervals shrink much more slowly
+SAMPLE_TARGET_CI_WEIGHTED = float(os.getenv("SAMPLE_TARGET_CI_WEIGHTED", 5.0))
+SAMPLE_CONFIDENCE = float(os.getenv("SAMPLE_CONFIDENCE", 0.95))
+SAMPLE_MIN_SCORED = int(os.getenv("SAMPLE_MIN_SCORED", 300))
+SAMPLE_MAX_FETCH = int(os.getenv("SAMPLE_MAX_FETCH", 50_000))  # comments fetched before giving up on the target
+
+
+def like_stratum(likes) -> int:
+    return bisect_right(LIKE_STRATA, max(likes, 0)) - 1
+
+
+def is_sampled(comment, rate) -> bool:
+    # Stable per comment ID, so re-running an analysis scores the same comments
+    key = comment.get("id") or comment["text"]
+    return zlib.crc32(key.encode("utf-8")) < rate * 2 ** 32
+
+
+class StratifiedEstimate:
+    """
+    Sentiment distribution of a video estimated from a stratified sample.
+
+    Every fetched comment counts towards its like stratum (the first phase);
+    only the scored ones (second phase) carry a label. Shares are stratified
+    means, like-weighted shares are ratio estimates, and the intervals use the
+    double-sampling variance: the spread between fetched comments plus the
+    extra error of scoring only part of each stratum.
+
+    Pages come newest first and fetching stops early, so the estimate describes
+    the most recent `fetched` comments, not the whole video. The first-phase
+    variance gets no finite-population correction from the video's comment
+    count unless every comment was fetched (`covers_all`).
+    """
+
+    def __init__(self, population=None, confidence=SAMPLE_CONFIDENCE):
+        self.population = population   # total comments on the video, when known (reporting / covers_all only)
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.confidence = confidence
+        self.fetched = [0] * len(LIKE_STRATA)
+        self.samples = [[] for _ in LIKE_STRATA]   # (label, likes) per stratum
+        self.pending = [0] * len(LIKE_STRATA)   # chosen for scoring, per stratum
+
+    def add_fetched(self, comment):
+        self.fetched[like_stratum(comment.get("likeCount", 0))] += 1
+
+    def add_scored(self, table, start=0):
+        # Rows of `table` from `start` on, as appended after scoring
+        for class_id, likes in zip(table.labels[start:].tolist(), table.likes[start:].tolist()):
+            likes = max(likes, 0)
+            self.samples[like_stratum(likes)].append((LABELS[class_id], likes))
+
+    @property
+    def covers_all(self) -> bool:
+        return bool(self.population) and sum(self.fetched) >= self.population
+
+    @property
+    def scored(self) -> int:
+        return sum(len(s) for s in self.samples)
+
+    def _strata(self):
+        # (W_h, N_h, samples) for strata seen so far
+        total = sum(self.fetched)
+        return [(n / total, n, s) for n, s in zip(self.fetched, self.samples) if n], total
+
+    def _variance(self, values_per_stratum, strata, total) -> float:
+        # Double sampling for stratification: S²(1/n' - 1/N) + Σ W_h S_h² (N_h/n_h - 1) / n'
+        means, within, extra = [], 0.0, 0.0
+        for (weight, n_fetched, _), values in zip(strata, values_per_stratum):
+            n = len(values)
+            mean = sum(values) / n
+            s2 = sum((v - mean) ** 2 for v in values) / (n - 1) if n > 1 else 0.25
+            means.append((weight, mean))
+            within += weight * s2
+            extra += weight * s2 * (n_fetched / n - 1) / total
+
+        overall = sum(w * m for w, m in means)
+        between = sum(w * (m - overall) ** 2 for w, m in means)
+        # With every comment fetched the first phase is a census; otherwise the fetched (recent) comments
+        # are not a random draw from the video, so its size must not shrink the interval
+        first_phase = 0.0 if self.covers_all else 1 / total
+        return (within + between) * first_phase + extra
+
+    def estimate(self) -> dict:
+        strata, total = self._strata()
+        if not strata or any(not s for _, _, s in strata):
+            return None
+
+        weights = [[1 + likes for _, likes in s] for _, _, s in strata]
+        mean_weight = sum(w * sum(ws) / len(ws) for (w, _, _), ws in zip(strata, weights))
+
+        result = {"raw": {}, "weighted": {}}
+        for label in LABELS:
+            hits = [[1.0 if l == label else 0.0 for l, _ in s] for _, _, s in strata]
+            share = sum(w * sum(h) / len(h) for (w, _, _), h in zip(strata, hits))
+            ci = self.z * math.sqrt(self._variance(hits, strata, total))
+
+            # Ratio estimate Σ w·1[label] / Σ w, linearized: residuals w_i (1[label] - R)
+            liked = [[(1 + likes) * (l == label) for l, likes in s] for _, _, s in strata]
+            ratio = sum(w * sum(v) / len(v) for (w, _, _), v in zip(strata, liked)) / mean_weight
+            residuals = [[x - ratio * y for x, y in zip(v, ws)] for v, ws in zip(liked, weights)]
+            ratio_ci = self.z * math.sqrt(self._variance(residuals, strata, total)) / mean_weight
+
+            likes = sum(n * sum(likes for l, likes in s if l == label) / len(s) for _, n, s in strata)
+            result["raw"][label] = (share, ci, likes)
+            result["weighted"][label] = (ratio, ratio_ci, likes)
+        return result
+
+    def statistics(self, target_ci=SAMPLE_TARGET_CI, target_ci_weighted=SAMPLE_TARGET_CI_WEIGHTED,
+                   min_scored=SAMPLE_MIN_SCORED) -> dict:
+        """Same shape as utils.sentiment_statistics, plus a ± interval per share and a "sampling" summary."""
+        total = sum(self.fetched)
+        estimate = self.estimate()
+
+        def distribution(mode, scale):
+            dist = {}
+            for label in LABELS:
+                share, ci, likes = estimate[mode][label] if estimate else (0.0, 1.0, 0.0)
+                dist[label] = {
+                    "comment_count": round(estimate["raw"][label][0] * total) if estimate else 0,
+                    "like_weight": round(likes),
+                    "percentage": round(share * 100, 2),
+                    "ci": round(ci * 100, 2),
+                }
+            return {"total": scale, "distribution": dist}
+
+        raw = distribution("raw", total)
+        weighted = distribution("weighted", total + sum(d["like_weight"] for d in raw["distribution"].values()))
+        max_ci = max(d["ci"] for d in raw["distribution"].values())
+        max_ci_weighted = max(d["ci"] for d in weighted["distribution"].values())
+        return {
+            "real_total": total,
+            "raw": raw,
+            "weighted": weighted,
+            "sampling": {
+                "fetched": total,
+                "scored": self.scored,
+                "population": self.population,
+                "covers_all": self.covers_all,   # otherwise: the `fetched` most recent comments
+                "confidence": self.confidence,
+                "target_ci": target_ci,
+                "target_ci_weighted": target_ci_weighted,
+                "max_ci": max_ci,
+                "max_ci_weighted": max_ci_weighted,
+                "converged": (estimate is not None and self.scored >= min_scored
+                              and max_ci <= target_ci and max_ci_weighted <= target_ci_weighted),
+            },
+        }
+
+
+def analyze_comments_sampled(video_id, population=None, target_ci=SAMPLE_TARGET_CI,
+                             target_ci_weighted=SAMPLE_TARGET_CI_WEIGHTED, confidence=SAMPLE_CONFIDENCE,
+                             max_fetch=SAMPLE_MAX_FETCH, min_scored=SAMPLE_MIN_SCORED):
+    """
+    Estimate a video's sentiment distribution without scoring every comment.
+
+    Pages are fetched as in the full pipeline (newest first, the next one while
+    the current one is scored), but only a like-stratified share of each page
+    is sent to the sentiment API, so the result describes the most recent
+    comments fetched. Fetching and scoring stop once every raw share is known
+    within ±`target_ci` points and every like-weighted one within
+    ±`target_ci_weighted`, or after `max_fetch` comments. Yields (table, stats) per page, the
+    CommentTable holding only the scored comments; stats carry the intervals under "ci" and a
+    "sampling" summary.
+    """
+    estimate = StratifiedEstimate(population, confidence)
+    table = CommentTable()
+
+    for page in prefetch(iter_comment_pages(video_id, max_fetch, use_cache=False)):
+        chosen = []
+        for comment in page:
+            estimate.add_fetched(comment)
+            stratum = like_stratum(comment.get("likeCount", 0))
+            # At least two per stratum, or its variance (and the stopping rule) is undefined
+            if is_sampled(comment, SAMPLE_RATES[stratum]) or estimate.pending[stratum] < 2:
+                chosen.append(comment)
+                estimate.pending[stratum] += 1
+
+        if chosen:
+            predictions = analyze_sentiment(chosen)
+            start = table.append(chosen, [r["predicted_class"] for r in predictions["results"]])
+            estimate.add_scored(table, start)
+
+        stats = estimate.statistics(target_ci, target_ci_weighted, min_scored)
+        yield table, stats
+        if stats["sampling"]["converged"]:
+            return
@@ -1,64 +1,260 @@
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 from dotenv import load_dotenv
 import os
-from utils import clean_text
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from preprocess import clean_texts
 
 load_dotenv()
 SENTIMENT_API_URL = os.getenv("SENTIMENT_API_URL")
+SENTIMENT_MAX_CONCURRENCY = int(os.getenv("SENTIMENT_MAX_CONCURRENCY", 16))
+SENTIMENT_MAX_CHUNK = int(os.getenv("SENTIMENT_MAX_CHUNK", 1024))  # texts per /predict/stream call
+SENTIMENT_TARGET_LATENCY = float(os.getenv("SENTIMENT_TARGET_LATENCY", 1.0))  # seconds per streamed call
+SENTIMENT_MAX_RETRIES = int(os.getenv("SENTIMENT_MAX_RETRIES", 5))
+EMPTY_TEXT_CLASS = 1  # neutral: nothing left to classify after cleaning (emoji-only, links, mentions)
 
-def send_batch(chunk):
-    payload = {"texts": chunk}
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease of in-flight requests and chunk size.
+
+    Every call that completes under `target_latency` grows concurrency by about one per round of calls and the
+    chunk size by `chunk_step`; slow calls shrink concurrency by a quarter, and
+    overload signals (429/503, timeouts) halve both.
+    """
+
+    def __init__(self, concurrency=4, max_concurrency=SENTIMENT_MAX_CONCURRENCY,
+                 chunk_size=64, min_chunk=8, max_chunk=SENTIMENT_MAX_CHUNK, chunk_step=32,
+                 target_latency=SENTIMENT_TARGET_LATENCY):
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.chunk = min(chunk_size, max_chunk)
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.chunk_step = chunk_step
+        self.target_latency = target_latency
+        self.inflight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.inflight >= int(self.concurrency):
+                self._cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify_all()
+
+    def chunk_size(self) -> int:
+        with self._cond:
+            return self.chunk
+
+    def on_success(self, latency):
+        with self._cond:
+            if latency > self.target_latency:
+                # Server is queueing: back off gently before it starts shedding
+                self.concurrency = max(1.0, self.concurrency * 0.75)
+                return
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            if latency < self.target_latency / 2:
+                self.chunk = min(self.max_chunk, self.chunk + self.chunk_step)
+            self._cond.notify_all()
+
+    def on_overload(self):
+        with self._cond:
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.chunk = max(self.min_chunk, self.chunk // 2)
+
+    def state(self) -> dict:
+        with self._cond:
+            return {"concurrency": int(self.concurrency), "chunk_size": self.chunk, "inflight": self.inflight}
+
+
+class SentimentClient:
+    """
+    Keep-alive client for the sentiment API.
+
+    Texts are split into chunks streamed through /predict/stream in parallel
+    over one pooled session; each chunk's NDJSON lines are read as they arrive
+    and placed back by index. Chunk size and parallelism follow an
+    AIMDController. Overloaded (429/503), timed-out and interrupted calls are
+    retried with jittered exponential backoff, never sooner than the server's
+    Retry-After.
+    """
+
+    def __init__(self, base_url=SENTIMENT_API_URL, controller=None, max_retries=SENTIMENT_MAX_RETRIES,
+                 timeout=100, base_backoff=0.5, max_backoff=30.0, priority="interactive"):
+        self.base_url = base_url
+        self.controller = controller or AIMDController()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.controller.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["X-Priority"] = priority
+
+    def predict(self, texts) -> list[int]:
+        """Predicted class IDs for `texts`, in order."""
+        results = [None] * len(texts)
+        if not texts:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.controller.max_concurrency) as pool:
+            futures = []
+            start = 0
+            while start < len(texts):
+                size = self.controller.chunk_size()
+                self.controller.acquire()
+                futures.append(pool.submit(self._run_chunk, texts, start, size, results))
+                start += size
+                if any(f.done() and f.exception() for f in futures):
+                    break   # stop dispatching once a chunk has failed for good
+
+            for future in futures:
+                future.result()
+
+        return results
+
+    def _run_chunk(self, texts, start, size, results):
+        try:
+            results[start:start + size] = self.send_batch(texts[start:start + size])
+        finally:
+            self.controller.release()
+
+    def send_batch(self, chunk) -> list[int]:
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            started = time.monotonic()
+            try:
+                # Admission happens before the body, so overload still shows up as a 429/503 status
+                with self.session.post(
+                    f"{self.base_url}/predict/stream",
+                    json={"texts": chunk},
+                    stream=True,
+                    timeout=self.timeout  # per read, not for the whole stream
+                ) as response:
+                    if response.status_code in (429, 503):
+                        error = f"Sentiment API overloaded ({response.status_code}): {response.text}"
+                        retry_after = _retry_after(response)
+                    elif not response.ok:
+                        raise RuntimeError(f"Sentiment API HTTP error {response.status_code}: {response.text}")
+                    else:
+                        results = _read_stream(response, len(chunk))
+                        if results is not None:
+                            self.controller.on_success(time.monotonic() - started)
+                            return results
+                        error = "Sentiment API stream ended before all results were received"
+            except requests.exceptions.Timeout:
+                error = "Sentiment API timeout"
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                error = "Sentiment API connection error"
+            except requests.exceptions.RequestException as e:
+                raise RuntimeError(f"Unexpected Sentiment API error: {str(e)}") from e
+
+            self.controller.on_overload()
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            time.sleep(self._backoff(attempt, retry_after))
+
+        raise RuntimeError(f"{error} (after {self.max_retries} retries)")
+
+    def _backoff(self, attempt, retry_after=None) -> float:
+        # Full jitter, so clients that were rejected together don't come back together
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        if retry_after is not None:
+            delay += retry_after
+        return delay
+
+    def stats(self) -> dict:
+        return {**self.controller.state(), "retries": self.retries}
+
+
+def _read_stream(response, size):
+    # {"index", "predicted_class"} lines arrive in completion order; None if the stream was cut short
+    results = [None] * size
+    received = 0
+    for line in response.iter_lines():
+        if not line:
+            continue
+        item = json.loads(line)
+        if "error" in item:
+            raise RuntimeError(f"Sentiment API stream error: {item['error']}")
+        if results[item["index"]] is None:
+            received += 1
+        results[item["index"]] = item["predicted_class"]
+    return results if received == size else None
+
+
+def _retry_after(response):
     try:
-        response = requests.post(
-            f"{SENTIMENT_API_URL}/predict",
-            json=payload,
-            timeout=100
-        )
-        response.raise_for_status()  # bắt 4xx / 5xx
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+client = SentimentClient()
+
+def prepare_texts(texts):
+    """
+    Clean `texts` and keep one copy of each distinct non-empty text.
 
-        return response.json()
+    Returns (cleaned, unique, positions): positions[i] is the index of
+    cleaned[i] in `unique`, or None when it cleaned down to nothing.
+    """
+    cleaned = clean_texts(texts)
+    unique, positions = [], []
+    seen = {}
+    for text in cleaned:
+        if not text:
+            positions.append(None)
+            continue
+        # Cleaning leaves the gaps where symbols were; the tokenizer ignores whitespace runs, so they don't count
+        key = " ".join(text.split())
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(key)
+        positions.append(seen[key])
+    return cleaned, unique, positions
 
-    except requests.exceptions.Timeout:
-        raise RuntimeError("Sentiment API timeout")
 
-    except requests.exceptions.ConnectionError:
-        raise RuntimeError("Sentiment API connection error")
+# Texts that never reached the API, across all calls
+prep_stats = {"texts": 0, "sent": 0, "duplicates": 0, "empty": 0}
+_prep_lock = threading.Lock()
 
-    except requests.exceptions.HTTPError as e:
-        raise RuntimeError(
-            f"Sentiment API HTTP error {response.status_code}: {response.text}"
-        ) from e
 
-    except Exception as e:
-        raise RuntimeError(f"Unexpected Sentiment API error: {str(e)}") from e
-    
 def analyze_sentiment(comments):
-    texts = [c["text"] for c in comments]
-    texts = [clean_text(t) for t in texts]
-    sentiments = []
-    if len(texts) > 128:
-        chunks = [texts[i:i+128] for i in range(0, len(texts), 128)]
-
-
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            futures = [executor.submit(send_batch, c) for c in chunks]
-
-            for f in as_completed(futures):
-                sentiments.append(f.result())
-
-    else:
-        sentiments.append(send_batch(texts))
-    
-    if len(sentiments) == 1:
-        sentiments = sentiments[0]
-
-    elif len(sentiments) > 1:
-        batch_size = 0
-        results = []
-        for batch in sentiments:
-            batch_size += batch['batch_size']
-            results.extend(batch['results'])
-        sentiments = {"batch_size": batch_size, "results": results}
-
-    return sentiments
\ No newline at end of file
+    # Only distinct non-empty texts are scored; duplicates and empty texts are filled back in by position
+    cleaned, unique, positions = prepare_texts([c["text"] for c in comments])
+    predictions = client.predict(unique)
+
+    results = [
+        {"text": text, "predicted_class": EMPTY_TEXT_CLASS if pos is None else predictions[pos]}
+        for text, pos in zip(cleaned, positions)
+    ]
+
+    empty = positions.count(None)
+    saved = {"duplicates": len(cleaned) - len(unique) - empty, "empty": empty}
+    with _prep_lock:
+        prep_stats["texts"] += len(cleaned)
+        prep_stats["sent"] += len(unique)
+        prep_stats["duplicates"] += saved["duplicates"]
+        prep_stats["empty"] += saved["empty"]
+        totals = dict(prep_stats)
+
+    if cleaned:
+        print(f"♻️ Sentiment: {len(unique)} of {len(cleaned)} texts sent, {saved['duplicates']} duplicate(s) "
+              f"and {saved['empty']} empty skipped (since start: {totals['sent']} of {totals['texts']} sent)")
+
+    return {"batch_size": len(cleaned), "results": results, "sent": len(unique), "saved": saved}
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+YT_HTTP_POOL_SIZE = int(os.getenv("YT_HTTP_POOL_SIZE", 16))  # keep-alive connections to googleapis.com
+YT_HTTP_MEASURE = os.getenv("YT_HTTP_MEASURE", "0") == "1"  # log bytes / latency of every call
+
+
+class _Response(dict):
+    # The parts of httplib2.Response that googleapiclient reads: lower-case header dict + status/reason
+    def __init__(self, response):
+        super().__init__((k.lower(), v) for k, v in response.headers.items())
+        self.status = response.status_code
+        self.reason = response.reason
+        self["status"] = str(response.status_code)
+
+
+class PooledHttp:
+    """
+    httplib2-compatible transport for googleapiclient on top of one pooled
+    requests.Session, so every thread shares keep-alive connections (an
+    httplib2.Http can only be used by one thread at a time).
+
+    Bodies are read off the wire as sent (gzip, which googleapiclient asks
+    for) and decompressed here, so `stats` can report both sizes. With
+    `measure`, every call is also printed.
+    """
+
+    def __init__(self, pool_size=YT_HTTP_POOL_SIZE, timeout=60, measure=YT_HTTP_MEASURE):
+        self.timeout = timeout
+        self.measure = measure
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        start = time.perf_counter()
+        response = self.session.request(method, uri, data=body, headers=headers,
+                                        timeout=self.timeout, stream=True)
+        try:
+            wire = response.raw.read(decode_content=False)
+        finally:
+            response.close()
+        content = _decode(wire, response.headers.get("Content-Encoding", ""))
+        elapsed = time.perf_counter() - start
+
+        self._record(_endpoint(uri), len(wire), len(content), elapsed, response.status_code)
+        return _Response(response), content
+
+    def _record(self, endpoint, wire_bytes, bytes_, seconds, status):
+        with self._lock:
+            entry = self._stats.setdefault(endpoint, {"calls": 0, "wire_bytes": 0, "bytes": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["wire_bytes"] += wire_bytes
+            entry["bytes"] += bytes_
+            entry["seconds"] += seconds
+        if self.measure:
+            print(f"📶 {endpoint} {status}: {wire_bytes} B on the wire ({bytes_} B decoded) in {seconds * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    **entry,
+                    "seconds": round(entry["seconds"], 3),
+                    "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 1),
+                    "avg_wire_bytes": entry["wire_bytes"] // entry["calls"],
+                }
+                for endpoint, entry in self._stats.items()
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def _decode(body, encoding):
+    encoding = encoding.lower()
+    if "gzip" in encoding:
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if "deflate" in encoding:
+        return zlib.decompress(body)
+    return body
+
+
+def _endpoint(uri):
+    # e.g. https://youtube.googleapis.com/youtube/v3/commentThreads?... -> commentThreads
+    return urlsplit(uri).path.rstrip("/").rsplit("/", 1)[-1]
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 6))  # slow stages running at once, across all sessions
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", 6))  # fast fetch stages running at once
+
+# Shared by every session; stages are mostly waiting on network calls. Fast fetch stages get their own
+# pool so they never queue behind summaries / embeddings of other sessions (or of cancelled runs,
+# whose running stages can't be interrupted)
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+_fetch_executor = ThreadPoolExecutor(max_workers=PIPELINE_FETCH_WORKERS, thread_name_prefix="pipeline-fetch")
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class StageError(RuntimeError):
+    """Raised by `result` for a stage that failed, or whose dependency failed."""
+
+
+class _Stage:
+    def __init__(self, name, fn, deps, fast):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.fast = fast
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+
+class PipelineRun:
+    """
+    Dependency graph of the analysis stages of one video.
+
+    Each stage is a function called with the results of its dependencies (in
+    `deps` order). A stage is submitted to the shared thread pool as soon as
+    all its dependencies are done, so independent stages (video info, comments,
+    transcript, summary) run concurrently and a dependent one starts the moment
+    its inputs land. Stages marked `fast` (quick fetches the page shows first)
+    run on a separate pool, so they don't wait behind slow stages. Stages can
+    be added after `start`, e.g. once the user has analyzed the comments, and
+    adding one under an existing name replaces it (a replaced stage that is
+    still running finishes but its result is dropped). A failed stage fails
+    everything downstream of it; after `cancel`, added stages fail at once.
+
+    Stage functions run outside the Streamlit script, so they must not call
+    `st.*`; the UI polls `status` / `finished` and reads `result`.
+    """
+
+    def __init__(self, key=None, executor=_executor, fetch_executor=_fetch_executor):
+        self.key = key   # what the run was built for, e.g. the video ID
+        self.executor = executor
+        self.fetch_executor = fetch_executor
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._started = False
+        self._cancelled = False
+
+    def add(self, name, fn, deps=(), fast=False) -> "PipelineRun":
+        with self._lock:
+            missing = [d for d in deps if d not in self._stages]
+            if missing:
+                raise ValueError(f"Stage {name!r} depends on unknown stage(s): {', '.join(missing)}")
+            stage = self._stages[name] = _Stage(name, fn, deps, fast)
+            failed = next((d for d in deps if self._stages[d].state == FAILED), None)
+            cancelled = self._cancelled
+            ready = self._started and self._ready(stage)
+        if cancelled:
+            self._finish(stage, FAILED, StageError("Cancelled"))
+        elif failed:
+            self._finish(stage, FAILED, StageError(f"{failed} failed: {self._stages[failed].error}"))
+        elif ready:
+            self._submit(stage)
+        return self
+
+    def start(self) -> "PipelineRun":
+        with self._lock:
+            self._started = True
+            ready = [s for s in self._stages.values() if self._ready(s)]
+        for stage in ready:
+            self._submit(stage)
+        return self
+
+    def cancel(self):
+        """Drop the stages that haven't started (e.g. the user moved on to another video)."""
+        with self._lock:
+            self._cancelled = True
+            pending = [s for s in self._stages.values() if s.state == PENDING]
+        for stage in pending:
+            self._finish(stage, FAILED, StageError("Cancelled"))
+
+    # ===== Results =====
+    def __contains__(self, name):
+        return name in self._stages
+
+    def status(self, name=None):
+        if name is not None:
+            return self._stages[name].state
+        return {name: stage.state for name, stage in self._stages.items()}
+
+    def finished(self) -> set:
+        # Stages that are done or failed (the UI diffs this between reruns)
+        return {name for name, stage in self._stages.items() if stage.done.is_set()}
+
+    def pending(self) -> bool:
+        return any(not stage.done.is_set() for stage in self._stages.values())
+
+    def wait(self, name, timeout=None) -> bool:
+        return self._stages[name].done.wait(timeout)
+
+    def result(self, name, timeout=None):
+        """Result of a stage, waiting for it if needed; re-raises its error as a StageError."""
+        stage = self._stages[name]
+        if not stage.done.wait(timeout):
+            raise TimeoutError(f"Stage {name!r} is still {stage.state}")
+        if stage.state == FAILED:
+            raise StageError(str(stage.error)) from stage.error
+        return stage.result
+
+    def error(self, name):
+        return self._stages[name].error
+
+    def timings(self) -> dict:
+        # Seconds per finished stage, plus when it finished relative to the first start
+        starts = [s.started for s in self._stages.values() if s.started]
+        origin = min(starts) if starts else 0.0
+        return {
+            name: {"seconds": round(s.finished - s.started, 3), "at": round(s.finished - origin, 3)}
+            for name, s in self._stages.items() if s.started and s.finished
+        }
+
+    # ===== Scheduling =====
+    def _ready(self, stage) -> bool:
+        # Caller holds the lock
+        return stage.state == PENDING and all(self._stages[d].state == DONE for d in stage.deps)
+
+    def _submit(self, stage):
+        with self._lock:
+            if stage.state != PENDING or self._cancelled:
+                return
+            stage.state = RUNNING
+        (self.fetch_executor if stage.fast else self.executor).submit(self._run, stage)
+
+    def _run(self, stage):
+        stage.started = time.perf_counter()
+        try:
+            if self._cancelled:
+                raise StageError("Cancelled")
+            args = [self._stages[d].result for d in stage.deps]
+            stage.result = stage.fn(*args)
+            state, error = DONE, None
+        except Exception as e:
+            state, error = FAILED, e
+        stage.finished = time.perf_counter()
+        self._finish(stage, state, error)
+
+    def _finish(self, stage, state, error):
+        with self._lock:
+            stage.state, stage.error = state, error
+            stage.done.set()
+            if self._stages.get(stage.name) is not stage:
+                return   # replaced while running
+            if state == DONE:
+                ready = [s for s in self._stages.values() if stage.name in s.deps and self._ready(s)]
+                skipped = []
+            else:
+                ready = []
+                skipped = [s for s in self._stages.values() if stage.name in s.deps and s.state == PENDING]
+        for dependent in ready:
+            self._submit(dependent)
+        for dependent in skipped:
+            self._finish(dependent, FAILED, StageError(f"{stage.name} failed: {error}"))
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timezone
+
+from services.cache_store import cache
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")   # YouTube quotas reset at midnight Pacific time
+except Exception:
+    _QUOTA_TZ = timezone.utc
+
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10_000))  # units per project per day
+YOUTUBE_VIDEO_QUOTA = int(os.getenv("YOUTUBE_VIDEO_QUOTA", 500))  # units optional fetches may spend per video per day
+DAILY_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", 1_000))  # kept free for core calls (info, top-level comments)
+
+# Cost in quota units of the Data API calls we make
+CALL_COST = {
+    "videos.list": 1,
+    "commentThreads.list": 1,
+    "comments.list": 1,
+}
+
+
+class QuotaScheduler:
+    """
+    YouTube Data API quota accounting, per day and per video.
+
+    Core calls are recorded with `record`; optional ones (reply threads) ask
+    `reserve` first and are refused once the video's budget, or the daily
+    budget minus `reserve_units`, is spent. Usage is kept as counters in the
+    shared store and every call is an atomic increment there, so app
+    processes on one host sharing CACHE_DB_PATH all count against the same
+    totals, and a restart doesn't reset them. Separate hosts count separately,
+    so split the budgets between replicas.
+    """
+
+    def __init__(self, daily_budget=YOUTUBE_DAILY_QUOTA, video_budget=YOUTUBE_VIDEO_QUOTA,
+                 reserve_units=DAILY_RESERVE, store=cache):
+        self.daily_budget = daily_budget
+        self.video_budget = video_budget
+        self.reserve_units = reserve_units
+        self.store = store
+
+    def record(self, call, video_id=None, count=1):
+        self.store.incr("quota", self._increments(CALL_COST[call] * count, video_id))
+
+    def reserve(self, call, video_id, count=1) -> bool:
+        increments = self._increments(CALL_COST[call] * count, video_id)
+        day_key, video_key = self._keys(video_id)
+        limits = {day_key: self.daily_budget - self.reserve_units, video_key: self.video_budget}
+        return self.store.incr("quota", increments, limits=limits) is not None
+
+    def usage(self, video_id=None) -> dict:
+        day_key, video_key = self._keys(video_id)
+        values = self.store.counters("quota", [k for k in (day_key, video_key) if k])
+        return {
+            "day": values[day_key],
+            "daily_budget": self.daily_budget,
+            "video": values[video_key] if video_key else None,
+            "video_budget": self.video_budget,
+        }
+
+    def _increments(self, units, video_id) -> dict:
+        day_key, video_key = self._keys(video_id)
+        return {day_key: units, video_key: units} if video_key else {day_key: units}
+
+    def _keys(self, video_id):
+        day = datetime.now(_QUOTA_TZ).strftime("%Y-%m-%d")
+        return day, (f"{day}|{video_id}" if video_id else None)
+
+
+quota = QuotaScheduler()
@@ -2,6 +2,7 @@
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from services.cache_store import cache
 
 # https://aistudio.google.com/app/apikey
 load_dotenv()
@@ -9,7 +10,10 @@ genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 model = genai.GenerativeModel("gemini-2.5-flash")
 
-def summarize_video(video_url):
+# Keyed by video ID, so youtu.be links and &t= variants of the same video share one summary
+@cache.cached("summary")
+def summarize_video(video_id):
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
     prompt = """
     You are summarizing a YouTube video to provide background context for a retrieval-augmented QA system.
 
@@ -1,4 +1,6 @@
 import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from youtube_transcript_api import (
@@ -7,20 +9,47 @@ from youtube_transcript_api import (
     NoTranscriptFound,
 )
 from dotenv import load_dotenv
+from services.cache_store import cache
+from services.http_transport import PooledHttp
+from services.quota import quota
 
 
 # from config import YOUTUBE_API_KEY
 load_dotenv()
-youtube = build("youtube", "v3", developerKey=os.getenv("GOOGLE_API_KEY"))
+# One pooled keep-alive transport shared by every thread (reply workers included)
+http = PooledHttp()
+youtube = build("youtube", "v3", developerKey=os.getenv("GOOGLE_API_KEY"), http=http)
 ytt_api = YouTubeTranscriptApi()
 
+REPLY_WORKERS = int(os.getenv("REPLY_WORKERS", 8))  # reply threads fetched concurrently
 
+# Partial responses: only the fields we read are sent back (YT_FIELD_MASKS=0 to compare with full responses)
+USE_FIELD_MASKS = os.getenv("YT_FIELD_MASKS", "1") != "0"
+FIELDS = {
+    "video_info": "items(snippet(title,description),statistics(viewCount,likeCount,commentCount))",
+    "comment_threads": "nextPageToken,items(id,snippet(totalReplyCount,"
+                       "topLevelComment/snippet(authorDisplayName,textOriginal,likeCount,publishedAt)))",
+    "replies": "nextPageToken,items(id,snippet(authorDisplayName,textOriginal,likeCount,publishedAt))",
+    "like_counts": "items(id,snippet/likeCount)",
+}
+
+
+def _fields(name):
+    return {"fields": FIELDS[name]} if USE_FIELD_MASKS else {}
+
+# Same fields as the transcript API's snippets, but JSON-friendly for the cache
+TranscriptSnippet = namedtuple("TranscriptSnippet", ["text", "start", "duration"])
+
+
+@cache.cached("video_info")
 def get_video_info(video_id):
     try:
         response = youtube.videos().list(
             part="snippet,statistics",
             id=video_id,
+            **_fields("video_info")
         ).execute()
+        quota.record("videos.list", video_id)
 
         if not response.get("items"):
             return None
@@ -45,9 +74,14 @@ def get_video_info(video_id):
 
 
 
+@cache.cached(
+    "transcript",
+    dump=lambda snippets: [list(s) for s in snippets],
+    load=lambda rows: [TranscriptSnippet(*row) for row in rows],
+)
 def get_video_transcript(video_id):
     try:
-        return ytt_api.fetch(video_id)
+        return [TranscriptSnippet(s.text, s.start, s.duration) for s in ytt_api.fetch(video_id)]
 
     except TranscriptsDisabled:
         raise RuntimeError("Transcript is disabled for this video")
@@ -62,44 +96,203 @@ def get_video_transcript(video_id):
 #     fetched_transcript = ytt_api.fetch(video_id)
 #     return fetched_transcript
 
-def get_video_comments(video_id, max_results=1000):
+def iter_comment_pages(video_id, max_results=1000, use_cache=True):
+    """
+    Yield top-level comments one API page (up to 100) at a time, as soon as each page arrives.
+    Served from the persistent cache when an earlier fetch covered `max_results`;
+    a completed fetch is stored for the next caller. `use_cache=False` skips
+    both (e.g. sampling runs that stop early on huge videos).
+    """
+    if not use_cache:
+        yield from _fetch_comment_pages(video_id, max_results)
+        return
+
+    cached = cache.get("comments", video_id)
+    if cached and (cached["complete"] or cached["max_results"] >= max_results):
+        comments = cached["comments"][:max_results]
+        for i in range(0, len(comments), 100):
+            yield comments[i:i + 100]
+        return
+
     comments = []
+    for page in _fetch_comment_pages(video_id, max_results):
+        comments.extend(page)
+        yield page
+
+    # Fewer than requested means the video has no more comments
+    cache.set("comments", video_id, {
+        "max_results": max_results,
+        "complete": len(comments) < max_results,
+        "comments": comments,
+    })
+
+
+def _fetch_comment_pages(video_id, max_results):
+    fetched = 0
 
     try:
         request = youtube.commentThreads().list(
             part="snippet",
             videoId=video_id,
+            order="time",   # newest first; incremental refresh relies on it
             textFormat="plainText",
-            maxResults=min(max_results, 100)
+            maxResults=min(max_results, 100),
+            **_fields("comment_threads")
         )
 
         response = request.execute()
+        quota.record("commentThreads.list", video_id)
 
         while response:
+            page = []
             for item in response.get("items", []):
                 snippet = item["snippet"]["topLevelComment"]["snippet"]
-                comments.append({
+                page.append({
+                    "id": item["id"],
                     "author": snippet["authorDisplayName"],
                     "text": snippet["textOriginal"],
-                    "likeCount": snippet.get("likeCount", 0)
+                    "likeCount": snippet.get("likeCount", 0),
+                    "publishedAt": snippet.get("publishedAt", ""),
+                    "totalReplyCount": item["snippet"].get("totalReplyCount", 0)
                 })
 
-            if "nextPageToken" in response and len(comments) < max_results:
+            fetched += len(page)
+            if page:
+                yield page
+
+            if "nextPageToken" in response and fetched < max_results:
                 request = youtube.commentThreads().list(
                     part="snippet",
                     videoId=video_id,
                     pageToken=response["nextPageToken"],
+                    order="time",
                     textFormat="plainText",
-                    maxResults=min(max_results - len(comments), 100)
+                    maxResults=min(max_results - fetched, 100),
+                    **_fields("comment_threads")
                 )
                 response = request.execute()
+                quota.record("commentThreads.list", video_id)
             else:
                 break
 
-        return comments
+    except HttpError as e:
+        raise RuntimeError(f"YouTube Comments API error: {e.reason}") from e
+
+    except Exception as e:
+        raise RuntimeError(f"Unexpected comments API error: {str(e)}") from e
+
+
+def get_video_comments(video_id, max_results=1000):
+    return [c for page in iter_comment_pages(video_id, max_results) for c in page]
+
+
+
+def get_new_comments(video_id, known_ids, newest_published_at, max_results=1000):
+    """
+    Comments newer than what is already stored: pages are fetched newest first
+    and fetching stops at the first known comment (or anything older than the
+    stored watermark, in case that comment was deleted). Always hits the API.
+    """
+    new_comments = []
+    for page in _fetch_comment_pages(video_id, max_results):
+        for comment in page:
+            if comment["id"] in known_ids or comment["publishedAt"] < newest_published_at:
+                return new_comments
+            new_comments.append(comment)
+    return new_comments
+
+
+def get_comment_like_counts(comment_ids):
+    """Current like counts for comments or replies, 50 IDs per comments.list call."""
+    like_counts = {}
+    comment_ids = list(comment_ids)
+
+    try:
+        for i in range(0, len(comment_ids), 50):
+            response = youtube.comments().list(
+                part="snippet",
+                id=",".join(comment_ids[i:i + 50]),
+                textFormat="plainText",
+                **_fields("like_counts")
+            ).execute()
+            quota.record("comments.list")
+
+            for item in response.get("items", []):
+                like_counts[item["id"]] = item["snippet"].get("likeCount", 0)
+
+        return like_counts
+
+    except HttpError as e:
+        raise RuntimeError(f"YouTube Comments API error: {e.reason}") from e
+
+    except Exception as e:
+        raise RuntimeError(f"Unexpected comments API error: {str(e)}") from e
+
+
+def fetch_replies(video_id, threads, max_workers=REPLY_WORKERS, batch_size=100):
+    """
+    Replies of the given top-level comments, fetched `max_workers` threads at a time.
+
+    Threads with the most replies (then likes) go first, and every comments.list
+    page asks the quota scheduler before it is fetched: once the video's or the
+    day's budget is spent, the remaining threads are skipped. Yields lists of
+    about `batch_size` replies as threads complete.
+    """
+    queue = sorted(
+        (t for t in threads if t.get("totalReplyCount")),
+        key=lambda t: (t["totalReplyCount"], t.get("likeCount", 0)),
+        reverse=True,
+    )
+    if not queue:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yt-replies") as pool:
+        # The pool takes work in submission order, so this is also the priority order
+        futures = [pool.submit(_fetch_thread_replies, video_id, t["id"]) for t in queue]
+        batch = []
+        try:
+            for future in as_completed(futures):
+                batch.extend(future.result())
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _fetch_thread_replies(video_id, thread_id):
+    replies = []
+    page_token = None
+
+    try:
+        while quota.reserve("comments.list", video_id):
+            params = {"part": "snippet", "parentId": thread_id, "textFormat": "plainText", "maxResults": 100}
+            if page_token:
+                params["pageToken"] = page_token
+            response = youtube.comments().list(**params, **_fields("replies")).execute()
+
+            for item in response.get("items", []):
+                snippet = item["snippet"]
+                replies.append({
+                    "id": item["id"],
+                    "parentId": thread_id,
+                    "author": snippet["authorDisplayName"],
+                    "text": snippet["textOriginal"],
+                    "likeCount": snippet.get("likeCount", 0),
+                    "publishedAt": snippet.get("publishedAt", "")
+                })
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        return replies
 
     except HttpError as e:
         raise RuntimeError(f"YouTube Comments API error: {e.reason}") from e
 
     except Exception as e:
-        raise RuntimeError(f"Unexpected comments API error: {str(e)}") from e
\ No newline at end of file
+        raise RuntimeError(f"Unexpected comments API error: {str(e)}") from e
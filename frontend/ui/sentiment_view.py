@@ -16,17 +16,18 @@ def render_sentiment(stats):
 
     mode = "weighted" if use_likes else "raw"
     dist = stats[mode]["distribution"]
+    sampling = stats.get("sampling")
 
     cols = st.columns(3)
 
     def metric(col, label, emoji):
         data = dist[label]
-        delta = f'{data["comment_count"]} comments'
+        delta = f'{"~" if sampling else ""}{data["comment_count"]} comments'
         if use_likes:
             delta += f' (👍 {data["like_weight"]} likes)'
         col.metric(
             f"{emoji} {label.capitalize()}",
-            f'{data["percentage"]}%',
+            f'{data["percentage"]}%' + (f' ±{data["ci"]}' if sampling else ""),
             delta
         )
 
@@ -34,6 +35,22 @@ def render_sentiment(stats):
     metric(cols[1], "neutral", "🟡")
     metric(cols[2], "negative", "🔴")
 
+    if sampling:
+        render_error_bars(dist)
+        if sampling.get("covers_all"):
+            scope = f'all {sampling["fetched"]} comments'
+        else:
+            scope = f'the {sampling["fetched"]} most recent comments'
+            if sampling.get("population"):
+                scope += f' (of {sampling["population"]} on the video)'
+        st.caption(
+            f'ℹ️ **Estimated from a sample of {scope}:** {sampling["scored"]} of them were scored, '
+            f'sampled by like count. ± is the {sampling["confidence"]:.0%} confidence interval in percentage points '
+            f'and covers these comments only, not older ones.'
+            + ("" if sampling["converged"] else " The target precision was not reached within the fetch limit.")
+        )
+        return
+
     fig, ax = plt.subplots(figsize=(8, 2))
     ax.pie(
         [dist["positive"]["percentage"],
@@ -51,7 +68,38 @@ def render_sentiment(stats):
 
     st.caption(
                     "ℹ️ **How sentiment is calculated:**\n"
+                    "- Covers the most recent comments (newest first), not YouTube's top comments\n"
                     "- When *Analyze based on comment likes* is OFF: each comment counts as 1\n"
                     "- When ON: comments with higher likes have more influence on sentiment distribution\n"
                     "- Percentages are always normalized over the selected method"
                 )
+
+
+def render_error_bars(dist):
+    labels = ["positive", "neutral", "negative"]
+    fig, ax = plt.subplots(figsize=(8, 2))
+    ax.barh(
+        [label.capitalize() for label in labels],
+        [dist[label]["percentage"] for label in labels],
+        xerr=[dist[label]["ci"] for label in labels],
+        capsize=6,
+        color=["#66bb66", "#ffdd66", "#ff6666"]
+    )
+    ax.invert_yaxis()
+    ax.set_xlim(0, 100)
+    ax.set_xlabel("% of comments")
+    st.pyplot(fig)
+
+
+def render_partial_sentiment(stats):
+    # Live counts while comments are still arriving; no widgets, so it can be redrawn every page
+    dist = stats["raw"]["distribution"]
+    sampling = stats.get("sampling")
+    cols = st.columns(3)
+    for col, label, emoji in zip(cols, ["positive", "neutral", "negative"], ["🟢", "🟡", "🔴"]):
+        col.metric(
+            f"{emoji} {label.capitalize()}",
+            f'{dist[label]["percentage"]}%' + (f' ±{dist[label]["ci"]}' if sampling else ""),
+            f'{dist[label]["comment_count"]} comments {"(est.)" if sampling else "so far"}',
+            delta_color="off"
+        )
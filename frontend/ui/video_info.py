@@ -1,15 +1,19 @@
 import streamlit as st
 
-def render_video_summary(summarize_fn, video_url):
-    if st.button("Get Video Summary by AI"):
-        with st.spinner("This may take a while..."):
-            st.session_state.video_summary = summarize_fn(video_url)
-            st.rerun()
+def render_video_summary(pipeline):
+    # Generated in the background since the URL was entered
+    state = pipeline.status("summary")
+    if state == "done":
+        st.session_state.video_summary = pipeline.result("summary")
+    elif state == "failed":
+        st.warning(f"AI-generated summary is not available: {pipeline.error('summary')}")
+    else:
+        st.caption("⏳ Generating AI summary...")
 
     if st.session_state.video_summary:
         st.write(f"**AI-generated Summary:** {st.session_state.video_summary}")
 
-def render_video_info(info, summarize_fn, video_url):
+def render_video_info(info, pipeline):
     left_col, right_col = st.columns([1.2, 1])
     with left_col:
         st.subheader("📊 Video Information")
@@ -23,4 +27,4 @@ def render_video_info(info, summarize_fn, video_url):
         )
 
     with right_col:
-        render_video_summary(summarize_fn, video_url)
+        render_video_summary(pipeline)
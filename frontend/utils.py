@@ -1,17 +1,12 @@
 import re
 from collections import Counter
+from preprocess import clean_text, split_sentences
 
 def extract_video_id(url: str):
     pattern = r"(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})"
     match = re.search(pattern, url)
     return match.group(1) if match else None
 
-def clean_text(text: str):
-    text = re.sub(r"http\S+|www\S+|https\S+", "", text, flags=re.MULTILINE)
-    text = re.sub(r"\@\w+|\#", "", text)
-    text = re.sub(r"[^A-Za-z0-9\s]+", "", text)
-    return text.strip()
-
 def translate_text(text: str, target_language: str = "en"):
     pass
 
@@ -30,28 +25,34 @@ def merge_comments_with_sentiment(comments, predictions):
     for i, cmt in enumerate(comments):
         sent = results[i]
 
-        merged.append({
+        item = {
             "author": cmt["author"],
             "text": cmt["text"],
             "likeCount": cmt["likeCount"],
             "sentiment": SENTIMENT_MAP[sent["predicted_class"]]
-        })
+        }
+        # kept for incremental refresh (newest-comment watermark, like updates) and reply threads
+        for key in ("id", "publishedAt", "parentId"):
+            if key in cmt:
+                item[key] = cmt[key]
+        merged.append(item)
 
     return merged
 
 
 def sentiment_statistics(merged):
-    comment_counter = Counter()
-    like_counter = Counter()
-    weight_counter = Counter()
-
+    counters = {"comments": Counter(), "likes": Counter()}
     for item in merged:
         label = item["sentiment"]
-        likes = max(item.get("likeCount", 0), 0)
+        counters["comments"][label] += 1
+        counters["likes"][label] += max(item.get("likeCount", 0), 0)
+    return statistics_from_counters(counters)
 
-        comment_counter[label] += 1
-        like_counter[label] += likes
-        weight_counter[label] += 1 + likes
+def statistics_from_counters(counters):
+    # counters: per-label comment and like counts, e.g. CommentTable.counters()
+    comment_counter = Counter(counters["comments"])
+    like_counter = Counter(counters["likes"])
+    weight_counter = Counter({label: comment_counter[label] + like_counter[label] for label in comment_counter})
 
     total_comments = sum(comment_counter.values())
     total_weight = sum(weight_counter.values())
@@ -126,7 +127,3 @@ def merge_transcript_by_time(snippets, max_duration=60.0):
         })
 
     return merged
-
-def split_sentences(text: str):
-    # Split by . ? !
-    return re.split(r'(?<=[.!?])\s+', text)